@@ -3,15 +3,45 @@ import asyncio
 import io
 import base64
 import queue
-import sounddevice as sd
+import httpx
+from collections import deque
 from threading import Thread
 
+import sounddevice as sd
 from dotenv import load_dotenv
 from deepgram import DeepgramClient
 
+from tts_cache import TTSCache
+from capture import MicCapture, EnergyVAD
+from live_stt import DeepgramLiveManager, LiveSession
+
 
 load_dotenv()
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(".cache", "tts"))
+DEEPGRAM_SPEAK_URL = os.getenv("DEEPGRAM_SPEAK_URL", "https://api.deepgram.com/v1/speak")
+PLAYBACK_RATE = 24000   # Aura's linear16 default
+
+# Aura output formats: query options, file extension, MIME type
+TTS_FORMATS = {
+    "opus": ({"encoding": "opus", "container": "ogg"}, "ogg", "audio/ogg"),
+    "mp3": ({"encoding": "mp3"}, "mp3", "audio/mpeg"),
+    "linear16": ({"encoding": "linear16", "container": "wav"}, "wav", "audio/wav"),
+}
+
+# Options for Indian English (clean + accurate). Interim results are needed
+# for UtteranceEnd; endpointing marks speech_final after 500 ms of silence.
+LIVE_OPTIONS = {
+    "model": "nova-2-general",
+    "language": "en-IN",
+    "smart_format": True,
+    "encoding": "linear16",
+    "sample_rate": 16000,
+    "channels": 1,
+    "interim_results": True,
+    "endpointing": 500,
+    "utterance_end_ms": 1000,
+}
 
 
 class AudioEngine:
@@ -21,24 +51,42 @@ class AudioEngine:
         - Live STT
         - TTS speech synthesis
         """
+        self.api_key = deepgram_key or DEEPGRAM_API_KEY
+        self.http = None
+
         try:
-            self.client = DeepgramClient(api_key=deepgram_key or DEEPGRAM_API_KEY)
+            self.client = DeepgramClient(api_key=self.api_key)
             print("Deepgram client initialized.")
         except Exception as e:
             print(f"Deepgram init failed: {e}")
             self.client = None
 
-        self.connection = None
-        self.is_recording = False
         self.audio_queue = queue.Queue()
 
+        # Repeated utterances (greetings, canned encouragements) skip Aura.
+        # One cache per output format, all sharing the same directory/quota.
+        self.tts_caches = {
+            name: TTSCache(directory=TTS_CACHE_DIR, extension=ext)
+            for name, (_, ext, _) in TTS_FORMATS.items()
+        }
+        self.tts_caches["opus"].enforce_quota()
+
+        # Warm, keepalive'd live STT connections shared by all sessions
+        self.live = DeepgramLiveManager(self.client, LIVE_OPTIONS)
+        self.sessions = set()
+
     # -----------------------------------------------------------
     # 🟦 LIVE SPEECH-TO-TEXT
     # -----------------------------------------------------------
     async def record_and_transcribe_live(self, callback, duration=15):
         """
         Start live microphone recording → Deepgram Nova-2 model → Callback with transcript.
-        This method runs for `duration` seconds.
+        `await callback(transcript, final)` gets interim results (final=False)
+        as well as final ones. Ends at the end of the user's utterance; `duration` seconds is only
+        a safety cap. Returns the full final transcript.
+
+        Each call is an independent LiveSession on a warm pooled connection,
+        so several sessions may run at once.
         """
 
         if not self.client:
@@ -47,127 +95,210 @@ class AudioEngine:
 
         print("Starting Deepgram Live STT...")
 
-        # Options for Indian English (clean + accurate)
-        options = {
-            "model": "nova-2-general",
-            "language": "en-IN",
-            "smart_format": True,
-            "encoding": "linear16",
-            "sample_rate": 16000,
-            "channels": 1
-        }
-
-        # Open live connection (v1)
-        self.connection = self.client.listen.live.v("1")
-
-        # Register event listener correctly
-        @self.connection.on("Results")
-        def on_transcript(connection, result, **kwargs):
-            transcript = ""
-            try:
-                transcript = result.channel.alternatives[0].transcript
-            except Exception:
-                pass
-
-            if transcript:
-                print(f"[LIVE TRANSCRIPT] {transcript}")
-
-                # Run user callback (safe for asyncio + threads)
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(callback(transcript))
-                else:
-                    asyncio.run(callback(transcript))
-
-        # Start the Deepgram WebSocket
-        await self.connection.start(options)
+        await self.live.start()
+        session = LiveSession(self.live, callback, max_duration=duration)
+        self.sessions.add(session)
 
-        # Start audio recording thread
-        self.is_recording = True
-        Thread(target=self._record_audio_thread, daemon=True).start()
+        def start_capture(session):
+            Thread(target=self._record_audio_thread, args=(session,), daemon=True).start()
 
-        # Auto-stop after duration
-        await asyncio.sleep(duration)
-        self.stop_recording()
-
-        return "Recording finished."
+        try:
+            return await session.run(on_started=start_capture)
+        finally:
+            self.sessions.discard(session)
 
     # -----------------------------------------------------------
     # 🎙 BACKGROUND AUDIO RECORDER
     # -----------------------------------------------------------
-    def _record_audio_thread(self):
+    def _record_audio_thread(self, session):
         """
-        Records raw PCM mic audio and sends to Deepgram.
-        Avoids blocking the UI.
+        Drains mic frames captured by the InputStream callback and sends
+        them to the session's Deepgram connection. Silent frames are dropped
+        by the energy VAD before they reach the socket. Avoids blocking the UI.
         """
-        RATE = 16000
-        BLOCK = 1024
+        capture = MicCapture()
+        vad = EnergyVAD()
+        preroll = deque(maxlen=vad.preroll_frames)
+        session.capture = capture
+        session.capture_metrics = counts = {"frames_sent": 0, "frames_silent": 0}
 
         try:
-            with sd.InputStream(
-                samplerate=RATE,
-                channels=1,
-                dtype="int16",
-                blocksize=BLOCK
-            ) as stream:
-
-                while self.is_recording:
-                    if not self.connection:
-                        break
-
-                    audio_block, overflow = stream.read(BLOCK)
-
-                    if overflow:
-                        print("Microphone overflow detected.")
+            capture.start()
+
+            while session.active:
+                frame = capture.ring.peek()
+                if frame is None:
+                    continue
+
+                if vad.is_speech(frame):
+                    # Replay the audio just before onset, then the frame itself
+                    while preroll:
+                        session.send_threadsafe(preroll.popleft())
+                        counts["frames_sent"] += 1
+                    session.send_threadsafe(frame.tobytes())
+                    counts["frames_sent"] += 1
+                else:
+                    preroll.append(frame.tobytes())
+                    counts["frames_silent"] += 1
 
-                    # Send PCM bytes to Deepgram
-                    self.connection.send(audio_block.tobytes())
+                capture.ring.advance()
 
         except Exception as e:
             print(f"Audio thread error: {e}")
-            self.stop_recording()
+            session.stop()
+
+        finally:
+            capture.stop()
+            print(f"[CAPTURE] {self.capture_stats(session)}")
+
+    @staticmethod
+    def capture_stats(session):
+        """
+        Counters for one session's capture: frames captured, sent upstream,
+        gated as silence, dropped on a full ring or a stalled send queue,
+        and driver-reported input overflows.
+        """
+        capture = session.capture
+        if not capture:
+            return {}
+        return {
+            "frames_captured": capture.frames_captured,
+            "frames_sent": session.capture_metrics["frames_sent"],
+            "frames_silent": session.capture_metrics["frames_silent"],
+            "frames_dropped": capture.ring.dropped,
+            "frames_send_dropped": session.frames_dropped,
+            "frames_backlog": len(capture.ring),
+            "overflows": capture.overflows,
+        }
 
     # -----------------------------------------------------------
     # 🟥 STOP RECORDING SAFELY
     # -----------------------------------------------------------
     def stop_recording(self):
-        self.is_recording = False
+        """Ends every active session (a connection cut off mid-utterance is closed, not pooled)."""
         print("Stopping microphone recording...")
+        for session in list(self.sessions):
+            session.stop()
 
-        if self.connection:
-            try:
-                self.connection.finish()
-                print("Deepgram connection closed.")
-            except Exception as e:
-                print(f"Error closing connection: {e}")
+    async def close(self):
+        """Stops recording and closes pooled Deepgram connections."""
+        self.stop_recording()
+        await self.live.close()
+        if self.http:
+            await self.http.aclose()
 
     # -----------------------------------------------------------
     # 🟩 TEXT-TO-SPEECH USING DEEPGRAM AURA
     # -----------------------------------------------------------
-    async def speak(self, text, voice="aura-asteria-en"):
+    async def speak(self, text, voice="aura-asteria-en", encoding="mp3"):
+        """
+        Deepgram Aura TTS → returns a Base64 data URI ready to embed in the
+        Flet Audio player. Thin wrapper around `speak_bytes`.
+        """
+        audio_bytes = await self.speak_bytes(text, voice, encoding)
+        if audio_bytes is None:
+            return None
+
+        mime = TTS_FORMATS[encoding][2]
+        encoded = base64.b64encode(audio_bytes).decode()
+        return f"data:{mime};base64,{encoded}"
+
+    async def speak_bytes(self, text, voice="aura-asteria-en", encoding="opus"):
         """
-        Deepgram Aura TTS → returns Base64 WAV audio string ready to embed.
+        Deepgram Aura TTS → raw encoded audio bytes (Opus/Ogg by default),
+        with no Base64 overhead. Returns None on failure.
         """
         if not self.client:
             print("Deepgram client missing for TTS.")
             return None
 
+        async def synthesize(text, voice):
+            return b"".join([chunk async for chunk in self._stream_upstream(text, voice, encoding)])
+
         try:
-            print("[TTS] Converting text to speech...")
+            return await self.tts_caches[encoding].get_bytes(text, voice, synthesize)
+        except Exception as e:
+            print(f"TTS Error ({type(e).__name__}): {e}")
+            return None
 
-            # Available Aura voices: asteria, arcas, orpheus, helios…
-            options = {"model": voice}
+    async def speak_stream(self, text, voice="aura-asteria-en", encoding="opus", chunk_size=16384):
+        """
+        Deepgram Aura TTS → async iterator of audio chunks.
+        Playback can start on the first chunk while the rest is still being
+        synthesized; the full clip is added to the cache once complete.
+        """
+        cache = self.tts_caches[encoding]
 
-            response = self.client.speak.v("1").generate(text, options)
+        cached_path = cache.lookup(text, voice)
+        if cached_path:
+            with open(cached_path, "rb") as f:
+                while chunk := await asyncio.to_thread(f.read, chunk_size):
+                    yield chunk
+            return
 
-            # Read raw bytes of audio
-            audio_bytes = response.stream.read()
+        chunks = []
+        async for chunk in self._stream_upstream(text, voice, encoding, chunk_size):
+            chunks.append(chunk)
+            yield chunk
 
-            # Convert to Base64 for Flet Audio player
-            encoded = base64.b64encode(audio_bytes).decode()
+        await cache.store(text, voice, b"".join(chunks))
 
-            return f"data:audio/wav;base64,{encoded}"
+    async def play_stream(self, text, voice="aura-asteria-en"):
+        """
+        Speaks `text` on the default output device. Playback starts with the
+        first linear16 chunk instead of after the whole clip is synthesized.
+        Cancelling the calling task stops playback.
+        """
+        header, pending, stream = b"", b"", None
+        try:
+            async for chunk in self.speak_stream(text, voice, encoding="linear16"):
+                if stream is None:
+                    # Skip the WAV header: PCM starts after the "data" chunk header
+                    header += chunk
+                    start = header.find(b"data")
+                    if start < 0 or len(header) < start + 8:
+                        continue
+                    chunk = header[start + 8:]
+                    stream = sd.RawOutputStream(samplerate=PLAYBACK_RATE, channels=1, dtype="int16")
+                    stream.start()
+
+                pending += chunk
+                usable = len(pending) - len(pending) % 2
+                if usable:
+                    await asyncio.to_thread(stream.write, pending[:usable])
+                    pending = pending[usable:]
+
+            if stream:
+                await asyncio.to_thread(stream.stop)
+
+        except asyncio.CancelledError:
+            if stream:
+                stream.abort()
+            raise
 
         except Exception as e:
-            print(f"TTS Error: {e}")
-            return None
+            print(f"Playback error ({type(e).__name__}): {e}")
+
+        finally:
+            if stream:
+                stream.close()
+
+    async def _stream_upstream(self, text, voice, encoding, chunk_size=16384):
+        print("[TTS] Converting text to speech...")
+
+        # Available Aura voices: asteria, arcas, orpheus, helios…
+        params = {"model": voice, **TTS_FORMATS[encoding][0]}
+
+        if self.http is None:
+            self.http = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0))
+
+        async with self.http.stream(
+            "POST",
+            DEEPGRAM_SPEAK_URL,
+            params=params,
+            headers={"Authorization": f"Token {self.api_key}"},
+            json={"text": text},
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
@@ -0,0 +1,194 @@
+import io
+import os
+import wave
+
+import numpy as np
+
+from metrics import AUDIO_PREP_BYTES
+
+try:
+    # Optional: decodes FLAC/OGG/float WAV and encodes FLAC. Without it only
+    # PCM WAV is transcoded and everything else is passed through.
+    import soundfile
+except ImportError:
+    soundfile = None
+
+
+TARGET_RATE = 16000         # what STT needs (same as the live mic path)
+UPLOAD_AUDIO_CODEC = os.getenv("UPLOAD_AUDIO_CODEC", "wav")     # "wav" (linear16) or "flac"
+TRIM_FRAME_MS = 20
+TRIM_PADDING_MS = 250       # kept around speech so the STT endpointer sees the edges
+TRIM_RANGE_DB = 35.0        # frames this far below the loudest one count as silence
+TRIM_FLOOR_DB = -55.0
+FIR_TAPS = 63
+
+
+# -----------------------------
+# DECODE
+# -----------------------------
+def _is_wav(head):
+    return head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+
+
+def _decode_wav(data):
+    with wave.open(io.BytesIO(data)) as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise wave.Error(f"unsupported sample width {width}")
+
+    return samples.reshape(-1, channels), rate
+
+
+def decode(data):
+    """
+    Returns (float32 samples shaped (frames, channels), sample rate), or
+    None when the format can't be decoded here.
+    """
+    if _is_wav(data):
+        try:
+            return _decode_wav(data)
+        except (wave.Error, EOFError, ValueError):
+            pass    # e.g. float or extensible WAV; soundfile may still read it
+
+    if soundfile is not None:
+        try:
+            samples, rate = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=True)
+            return samples, rate
+        except RuntimeError:
+            pass
+    return None
+
+
+# -----------------------------
+# DSP
+# -----------------------------
+def downmix(samples):
+    return samples.mean(axis=1, dtype=np.float32) if samples.shape[1] > 1 else samples[:, 0]
+
+
+def resample(samples, src_rate, dst_rate=TARGET_RATE):
+    """
+    Windowed-sinc low-pass (when downsampling) followed by linear
+    interpolation onto the target grid.
+    """
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+
+    if src_rate > dst_rate:
+        cutoff = 0.45 * dst_rate / src_rate     # cycles per input sample, just under Nyquist
+        n = np.arange(FIR_TAPS) - (FIR_TAPS - 1) / 2
+        taps = np.sinc(2 * cutoff * n) * np.hanning(FIR_TAPS)
+        taps /= taps.sum()
+        # Full convolution, shifted by the filter's group delay: same length
+        # as the input even for clips shorter than the filter
+        delay = (FIR_TAPS - 1) // 2
+        filtered = np.convolve(samples, taps.astype(np.float32), mode="full")
+        samples = filtered[delay:delay + len(samples)]
+
+    count = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.arange(count) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def trim_silence(samples, rate=TARGET_RATE):
+    """
+    Drops leading/trailing audio quieter than TRIM_RANGE_DB below the
+    loudest 20 ms frame. Clips with no audible frame are returned as-is.
+    """
+    frame = rate * TRIM_FRAME_MS // 1000
+    count = len(samples) // frame
+    if count == 0:
+        return samples
+
+    frames = samples[:count * frame].reshape(count, frame)
+    levels = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    threshold = max(levels.max() - TRIM_RANGE_DB, TRIM_FLOOR_DB)
+    voiced = np.flatnonzero(levels > threshold)
+    if len(voiced) == 0:
+        return samples
+
+    padding = rate * TRIM_PADDING_MS // 1000
+    start = max(0, voiced[0] * frame - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame + padding)
+    return samples[start:end]
+
+
+# -----------------------------
+# ENCODE
+# -----------------------------
+def encode(samples, rate=TARGET_RATE, codec=UPLOAD_AUDIO_CODEC):
+    """Returns (bytes, mimetype); FLAC falls back to linear16 WAV without soundfile."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+
+    if codec == "flac" and soundfile is not None:
+        buffer = io.BytesIO()
+        soundfile.write(buffer, pcm, rate, format="FLAC", subtype="PCM_16")
+        return buffer.getvalue(), "audio/flac"
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buffer.getvalue(), "audio/wav"
+
+
+# -----------------------------
+# PIPELINE
+# -----------------------------
+def prepare_audio(source, mimetype=None, codec=UPLOAD_AUDIO_CODEC):
+    """
+    Normalizes an uploaded clip for STT: decode -> downmix -> resample to
+    16 kHz -> trim silence -> re-encode. Blocking; run it in a thread.
+
+    `source` is a binary file object (the spooled upload). Returns
+    (payload bytes, mimetype, stats). Formats that can't be decoded here,
+    and clips that wouldn't get smaller, are passed through unchanged.
+    """
+    source.seek(0)
+    data = source.read()
+
+    # Compressed uploads we can't decode (or couldn't parse) go through as-is
+    decoded = decode(data) if soundfile is not None or _is_wav(data) else None
+    if decoded is None:
+        AUDIO_PREP_BYTES.inc(len(data), kind="original")
+        AUDIO_PREP_BYTES.inc(len(data), kind="sent")
+        return data, mimetype, {"action": "passthrough", "original_bytes": len(data),
+                                "prepared_bytes": len(data), "bytes_saved": 0}
+
+    samples, rate = decoded
+    mono = resample(downmix(samples), rate)
+    trimmed = trim_silence(mono)
+    payload, prepared_type = encode(trimmed, codec=codec)
+
+    stats = {
+        "action": "transcoded",
+        "original_bytes": len(data),
+        "prepared_bytes": len(payload),
+        "original_format": f"{rate} Hz x{samples.shape[1]}",
+        "duration_s": round(len(mono) / TARGET_RATE, 2),
+        "trimmed_s": round((len(mono) - len(trimmed)) / TARGET_RATE, 2),
+    }
+
+    if len(payload) >= len(data):
+        payload, prepared_type = data, mimetype
+        stats.update(action="passthrough", prepared_bytes=len(data))
+
+    stats["bytes_saved"] = stats["original_bytes"] - stats["prepared_bytes"]
+    AUDIO_PREP_BYTES.inc(stats["original_bytes"], kind="original")
+    AUDIO_PREP_BYTES.inc(stats["prepared_bytes"], kind="sent")
+    return payload, prepared_type, stats
@@ -0,0 +1,178 @@
+"""
+Local stand-ins for the OpenAI and Deepgram APIs, for benchmarking main:app
+without network access or API keys.
+
+    python bench/fake_upstreams.py --port 9100 --latency-ms 300 --token-ms 15 --error-rate 0.01
+
+Point the service at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1  OPENAI_API_KEY=fake
+    DEEPGRAM_URL=http://127.0.0.1:9100        DEEPGRAM_API_KEY=fake
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class FakeConfig:
+    latency_ms = float(os.getenv("FAKE_LATENCY_MS", "300"))
+    jitter_ms = float(os.getenv("FAKE_JITTER_MS", "50"))
+    token_ms = float(os.getenv("FAKE_TOKEN_MS", "15"))
+    tokens = int(os.getenv("FAKE_TOKENS", "40"))
+    error_rate = float(os.getenv("FAKE_ERROR_RATE", "0"))
+    stt_ms = float(os.getenv("FAKE_STT_MS", "250"))
+    tts_ms = float(os.getenv("FAKE_TTS_MS", "200"))
+    tts_bytes = int(os.getenv("FAKE_TTS_BYTES", "24000"))
+
+
+config = FakeConfig()
+app = FastAPI(title="Fake OpenAI + Deepgram")
+
+REPLY_WORDS = ("That sounds like a lot. I'm right here with you, and we can take it "
+               "one small step at a time. Would you like to tell me more?").split()
+
+
+async def upstream_delay(base_ms):
+    jitter = random.uniform(-config.jitter_ms, config.jitter_ms)
+    await asyncio.sleep(max(0.0, base_ms + jitter) / 1000)
+
+
+def maybe_fail():
+    if random.random() < config.error_rate:
+        return JSONResponse({"error": {"message": "fake upstream error", "type": "server_error"}},
+                            status_code=500)
+    return None
+
+
+def reply_tokens():
+    words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(config.tokens)]
+    return [w + " " for w in words]
+
+
+# -----------------------------
+# OPENAI
+# -----------------------------
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "created": 0, "owned_by": "fake"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await upstream_delay(config.latency_ms)
+    failed = maybe_fail()
+    if failed:
+        return failed
+
+    created = int(time.time())
+    tokens = reply_tokens()
+
+    if not body.get("stream"):
+        await asyncio.sleep(config.token_ms * len(tokens) / 1000)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": created,
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 20, "completion_tokens": len(tokens), "total_tokens": 20 + len(tokens)},
+        }
+
+    async def stream():
+        for token in tokens:
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(config.token_ms / 1000)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+# -----------------------------
+# DEEPGRAM
+# -----------------------------
+@app.post("/v1/listen")
+async def listen(request: Request):
+    audio = await request.body()
+    await upstream_delay(config.stt_ms)
+    failed = maybe_fail()
+    if failed:
+        return failed
+
+    duration = len(audio) / 32000
+    return {
+        "metadata": {
+            "transaction_key": "fake", "request_id": "fake", "sha256": "", "created": "",
+            "duration": duration, "channels": 1, "models": [], "model_info": {},
+        },
+        "results": {
+            "channels": [{"alternatives": [{"transcript": "I had a long day at school today",
+                                            "confidence": 0.99, "words": []}]}]
+        },
+    }
+
+
+@app.post("/v1/speak")
+async def speak(request: Request):
+    body = await request.json()
+    await upstream_delay(config.tts_ms)
+    failed = maybe_fail()
+    if failed:
+        return failed
+
+    async def audio():
+        yield os.urandom(config.tts_bytes)
+
+    # The Deepgram SDK reads these (and transfer-encoding, so stream the body)
+    headers = {
+        "request-id": f"fake-{random.getrandbits(64):016x}",
+        "model-uuid": "00000000-0000-0000-0000-000000000000",
+        "model-name": request.query_params.get("model", "aura-asteria-en"),
+        "char-count": str(len(body.get("text", ""))),
+    }
+    return StreamingResponse(audio(), media_type="audio/mpeg", headers=headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms, help="time to first byte")
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--token-ms", type=float, default=config.token_ms, help="delay between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=config.tokens, help="tokens per reply")
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--stt-ms", type=float, default=config.stt_ms)
+    parser.add_argument("--tts-ms", type=float, default=config.tts_ms)
+    args = parser.parse_args()
+
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.token_ms = args.token_ms
+    config.tokens = args.tokens
+    config.error_rate = args.error_rate
+    config.stt_ms = args.stt_ms
+    config.tts_ms = args.tts_ms
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
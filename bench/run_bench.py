@@ -0,0 +1,309 @@
+"""
+Load-test main:app against local fake OpenAI/Deepgram servers.
+
+    python bench/run_bench.py --concurrency 32 --requests 500
+    python bench/run_bench.py --scenarios text,stream --save-baseline bench/baseline.json
+    python bench/run_bench.py --compare bench/baseline.json --tolerance 0.10
+
+Starts bench/fake_upstreams.py and the service (uvicorn main:app) as
+subprocesses, waits for /ready, then drives each scenario and reports
+throughput, p50/p95/p99 latency (plus time-to-first-byte for streaming),
+error counts and the service's peak RSS. Exits 1 when --compare finds a
+regression beyond --tolerance.
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import wave
+import array
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# -----------------------------
+# PROCESSES
+# -----------------------------
+def start_process(args, env=None):
+    return subprocess.Popen(
+        [sys.executable] + args,
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_process(proc):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def wait_for(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                if (await http.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def rss_bytes(pid):
+    """Resident set size from /proc (Linux); 0 where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+# -----------------------------
+# PAYLOADS
+# -----------------------------
+def make_wav(seconds=3.0, rate=48000, channels=2):
+    """A tone in the format browsers/phones typically upload."""
+    samples = array.array("h", (
+        int(8000 * math.sin(2 * math.pi * 220 * (i // channels) / rate))
+        for i in range(int(seconds * rate) * channels)
+    ))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def chat_payload(i, cached):
+    # Unique texts by default so every request reaches the (fake) model
+    text = "tell me about my day" if cached else f"tell me about my day number {i}"
+    return {"text": text, "user_id": f"bench-{i % 50}", "no_cache": not cached}
+
+
+# -----------------------------
+# SCENARIOS
+# -----------------------------
+def app_status(res):
+    """
+    The chat endpoints report backend failures as a 200 with an "error"
+    key; count those as failures rather than successes.
+    """
+    if res.status_code == 200 and "error" in res.json():
+        return "app_error"
+    return res.status_code
+
+
+async def hit_text(http, i, args, audio):
+    res = await http.post("/chat/text", json=chat_payload(i, args.cached))
+    return app_status(res), None
+
+
+async def hit_stream(http, i, args, audio):
+    ttfb = None
+    started = time.perf_counter()
+    failed = False
+    async with http.stream("POST", "/chat/text/stream", json=chat_payload(i, args.cached)) as res:
+        async for line in res.aiter_lines():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            failed = failed or line == "event: error"
+    return ("app_error" if failed and res.status_code == 200 else res.status_code), ttfb
+
+
+async def hit_audio(http, i, args, audio):
+    res = await http.post(
+        "/chat/audio",
+        files={"file": ("clip.wav", audio, "audio/wav")},
+        data={"user_id": f"bench-{i % 50}"},
+    )
+    return app_status(res), None
+
+
+SCENARIOS = {"text": hit_text, "stream": hit_stream, "audio": hit_audio}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))
+    return values[index]
+
+
+async def run_scenario(name, args, base_url, pid):
+    hit = SCENARIOS[name]
+    audio = make_wav() if name == "audio" else None
+    latencies, ttfbs, statuses = [], [], {}
+    peak_rss = rss_bytes(pid)
+    counter = iter(range(args.requests))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as http:
+
+        async def worker():
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    status, ttfb = await hit(http, i, args, audio)
+                except httpx.HTTPError as e:
+                    status, ttfb = type(e).__name__, None
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+                if ttfb is not None:
+                    ttfbs.append(ttfb)
+
+        async def sample_rss():
+            nonlocal peak_rss
+            while True:
+                peak_rss = max(peak_rss, rss_bytes(pid))
+                await asyncio.sleep(0.1)
+
+        sampler = asyncio.create_task(sample_rss())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    ms = lambda v: round(v * 1000, 1) if v is not None else None
+    return {
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "ttfb_p50_ms": ms(percentile(ttfbs, 0.50)),
+        "ttfb_p95_ms": ms(percentile(ttfbs, 0.95)),
+        "errors": sum(n for s, n in statuses.items() if s != 200),
+        "statuses": {str(s): n for s, n in statuses.items()},
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+    }
+
+
+# -----------------------------
+# BASELINES
+# -----------------------------
+# Metric -> True when higher is better
+COMPARED = {
+    "throughput_rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False,
+    "ttfb_p50_ms": False, "peak_rss_mb": False,
+}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scenario, current in results.items():
+        before = baseline.get(scenario)
+        if not before:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            if worse:
+                regressions.append(f"{scenario}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def print_report(results):
+    columns = ["requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms",
+               "ttfb_p50_ms", "errors", "peak_rss_mb"]
+    print(f"{'scenario':<10}" + "".join(f"{c:>15}" for c in columns))
+    for scenario, row in results.items():
+        print(f"{scenario:<10}" + "".join(f"{str(row[c]):>15}" for c in columns))
+
+
+async def main(args):
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    fake = start_process([
+        "bench/fake_upstreams.py", "--port", str(args.fake_port),
+        "--latency-ms", str(args.latency_ms), "--token-ms", str(args.token_ms),
+        "--error-rate", str(args.error_rate),
+    ])
+    service = None
+    # Bench history/session databases go to a throwaway directory, not data/
+    state_dir = tempfile.TemporaryDirectory(prefix="magizh-bench-")
+    try:
+        await wait_for(f"{fake_url}/v1/models")
+        service = start_process(
+            ["-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+            env={
+                "OPENAI_BASE_URL": f"{fake_url}/v1",
+                "OPENAI_API_KEY": "fake",
+                "DEEPGRAM_URL": fake_url,
+                "DEEPGRAM_API_KEY": "fake",
+                "HISTORY_DB": os.path.join(state_dir.name, "history.db"),
+                "SHARED_STATE_DB": os.path.join(state_dir.name, "shared_state.db"),
+            },
+        )
+        await wait_for(f"{base_url}/ready")
+
+        results = {}
+        for name in args.scenarios.split(","):
+            results[name] = await run_scenario(name, args, base_url, service.pid)
+    finally:
+        if service:
+            stop_process(service)
+        stop_process(fake)
+        state_dir.cleanup()
+
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="text,stream,audio", help="comma-separated: text,stream,audio")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--cached", action="store_true", help="repeat one text so the response cache is hit")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=15)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,95 @@
+import os
+import json
+import random
+
+import httpx
+
+from intents import intent_engine
+from emotion import emotion_classifier, COLORS
+
+
+BACKEND_URL = os.getenv("MAGIZH_BACKEND_URL", "http://localhost:8000")
+
+QUOTES = [
+    "Be gentle to yourself today.",
+    "Small steps still move you forward.",
+    "It's okay to rest. You are doing your best.",
+    "You are stronger than you feel right now.",
+]
+
+FALLBACK_REPLY = "I hear you. It's okay to feel like that."
+
+
+class Brain:
+    def __init__(self, api_key=None, backend_url=BACKEND_URL, user_id="default_user"):
+        """
+        Client-side brain used by the Flet UI:
+        - Local intent engine answers common check-ins instantly
+        - Everything else goes to the MagizhBuddy backend (/chat/text,
+          or /chat/text/stream token by token)
+        """
+        self.api_key = api_key
+        self.backend_url = backend_url.rstrip("/")
+        self.user_id = user_id
+        self.http = None
+
+    def get_random_quote(self):
+        return random.choice(QUOTES)
+
+    def analyze_sentiment(self, text):
+        # returns polarity, color
+        emotion, polarity = emotion_classifier.classify(text)
+        return polarity, COLORS[emotion]
+
+    async def get_response(self, text, polarity=0.0):
+        local = intent_engine.reply(text)
+        if local:
+            return local[1]
+
+        try:
+            res = await self._client().post("/chat/text", json={"text": text, "user_id": self.user_id})
+            res.raise_for_status()
+            return res.json()["response"]
+        except Exception as e:
+            print(f"Brain backend error: {e}")
+            return FALLBACK_REPLY
+
+    async def stream_response(self, text):
+        """
+        Async iterator of reply tokens from /chat/text/stream (SSE).
+        Local intent replies and errors arrive as a single chunk. Closing or
+        cancelling the iterator aborts the HTTP request.
+        """
+        local = intent_engine.reply(text)
+        if local:
+            yield local[1]
+            return
+
+        received = False
+        try:
+            async with self._client().stream(
+                "POST", "/chat/text/stream", json={"text": text, "user_id": self.user_id}
+            ) as res:
+                res.raise_for_status()
+                event = None
+                async for line in res.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[5:])
+                        if event == "error":
+                            raise RuntimeError(data.get("error", "stream error"))
+                        if "token" in data:
+                            received = True
+                            yield data["token"]
+                    elif not line:
+                        event = None
+        except Exception as e:
+            print(f"Brain backend error: {e}")
+            if not received:
+                yield FALLBACK_REPLY
+
+    def _client(self):
+        if self.http is None:
+            self.http = httpx.AsyncClient(base_url=self.backend_url, timeout=30.0)
+        return self.http
@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from metrics import CACHE_LOOKUPS
+from shared_state import shared_store
+
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCT = re.compile(r"[\s.!?,;:~]+$")
+
+
+def normalize_text(text):
+    """
+    Folds trivial differences so "I feel sad", "i feel sad!!" and
+    "  I  feel sad. " share one cache entry.
+    """
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCT.sub("", text)
+
+
+def make_key(text, system_prompt, model, history=()):
+    """
+    Cache key for a completion. `history` is the conversation context sent
+    with the message; replies are only shared between requests whose
+    context matches exactly (e.g. two users with no history yet).
+    """
+    context = "\x1e".join(f"{m['role']}:{m['content']}" for m in history)
+    raw = "\x1f".join((model, system_prompt, context, normalize_text(text)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        """
+        Thread-safe TTL + size-bounded LRU cache for completion replies.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="response", result="miss")
+                return None
+
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="response", result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="response", result="hit")
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SharedResponseCache:
+    def __init__(self, store=None, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 namespace="response", evict_every=64):
+        """
+        ResponseCache with the same interface, stored in the cross-process
+        SharedStore so every worker reuses replies the others paid for.
+        Size is enforced every `evict_every` writes; hit/miss counters are
+        per process.
+        """
+        self.store = store or shared_store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.store.get(self.namespace, key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_LOOKUPS.inc(cache="response", result="miss" if value is None else "hit")
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.store.set(self.namespace, key, value, self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            evicted = self.store.evict(self.namespace, self.max_entries)
+            with self._lock:
+                self.evictions += evicted
+
+    def clear(self):
+        self.store.delete(self.namespace)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self.store.count(self.namespace),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "shared": True,
+            }
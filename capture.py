@@ -0,0 +1,132 @@
+import threading
+
+import numpy as np
+import sounddevice as sd
+
+
+SAMPLE_RATE = 16000
+BLOCK = 320             # 20 ms frames at 16 kHz
+RING_FRAMES = 256       # ~5 s of audio before frames are dropped
+
+
+class FrameRing:
+    def __init__(self, capacity=RING_FRAMES, block=BLOCK):
+        """
+        Preallocated single-producer / single-consumer ring of int16 frames.
+        The audio callback writes into it without allocating; when the
+        consumer falls behind, new frames are dropped (and counted) instead
+        of blocking the audio thread.
+        """
+        self.capacity = capacity
+        self.block = block
+        self._frames = np.zeros((capacity, block), dtype=np.int16)
+        self._write = 0
+        self._read = 0
+        self._ready = threading.Event()
+
+        self.dropped = 0
+
+    def __len__(self):
+        return self._write - self._read
+
+    def push(self, samples):
+        if self._write - self._read >= self.capacity:
+            self.dropped += 1
+            return False
+        self._frames[self._write % self.capacity, :] = samples
+        self._write += 1
+        self._ready.set()
+        return True
+
+    def peek(self, timeout=0.1):
+        """
+        Returns a view of the oldest frame (or None after `timeout`).
+        Call `advance()` once done with it; the slot may be reused after that.
+        """
+        if self._write == self._read:
+            self._ready.clear()
+            if self._write == self._read and not self._ready.wait(timeout):
+                return None
+        return self._frames[self._read % self.capacity]
+
+    def advance(self):
+        self._read += 1
+
+
+class EnergyVAD:
+    def __init__(self, threshold_db=12.0, min_level_db=-50.0, hangover_frames=30, preroll_frames=10):
+        """
+        Lightweight energy gate.
+
+        A frame counts as speech when its RMS level is `threshold_db` above the
+        tracked noise floor (and above `min_level_db` dBFS). After speech ends,
+        `hangover_frames` of trailing audio are still sent so the STT endpointer
+        sees the pause; `preroll_frames` of audio before speech onset are
+        replayed so word starts are not clipped.
+        """
+        self.threshold_db = threshold_db
+        self.min_level_db = min_level_db
+        self.hangover_frames = hangover_frames
+        self.preroll_frames = preroll_frames
+
+        self.noise_floor_db = -60.0
+        self._hangover = 0
+
+    @staticmethod
+    def level_db(frame):
+        samples = frame.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(samples * samples)) + 1e-9
+        return 20.0 * np.log10(rms)
+
+    def is_speech(self, frame):
+        level = self.level_db(frame)
+        loud = level > max(self.noise_floor_db + self.threshold_db, self.min_level_db)
+
+        if loud:
+            self._hangover = self.hangover_frames
+            return True
+
+        # Track the floor only on non-speech frames (fast down, slow up)
+        rate = 0.5 if level < self.noise_floor_db else 0.02
+        self.noise_floor_db += rate * (level - self.noise_floor_db)
+
+        if self._hangover > 0:
+            self._hangover -= 1
+            return True
+        return False
+
+
+class MicCapture:
+    def __init__(self, samplerate=SAMPLE_RATE, block=BLOCK, ring_frames=RING_FRAMES):
+        """
+        Callback-driven microphone capture into a FrameRing.
+        """
+        self.samplerate = samplerate
+        self.block = block
+        self.ring = FrameRing(ring_frames, block)
+        self.stream = None
+
+        self.frames_captured = 0
+        self.overflows = 0
+
+    def _callback(self, indata, frames, time_info, status):
+        if status and status.input_overflow:
+            self.overflows += 1
+        self.frames_captured += 1
+        self.ring.push(indata[:, 0])
+
+    def start(self):
+        self.stream = sd.InputStream(
+            samplerate=self.samplerate,
+            channels=1,
+            dtype="int16",
+            blocksize=self.block,
+            callback=self._callback,
+        )
+        self.stream.start()
+
+    def stop(self):
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
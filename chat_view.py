@@ -0,0 +1,96 @@
+import os
+from collections import deque
+
+import flet as ft
+
+
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "60"))              # bubbles kept as live controls
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))        # bubbles restored per "load earlier"
+CHAT_HISTORY_MAX = int(os.getenv("CHAT_HISTORY_MAX", "1000"))  # older messages kept as plain text
+
+BUBBLE_COLORS = {"user": "#DFF3FF", "buddy": "#FFFFFF"}
+
+
+class ChatView:
+    def __init__(self, window=CHAT_WINDOW, page_size=CHAT_PAGE_SIZE, max_history=CHAT_HISTORY_MAX,
+                 width=360, height=360):
+        """
+        Chat transcript backed by a lazily rendered ft.ListView.
+
+        Only the newest `window` messages exist as controls; older ones are
+        kept as (role, text) tuples (at most `max_history`) and rebuilt a
+        page at a time from the "Load earlier" button (the window shrinks back
+        on the next new message). Every change updates just the list (or a
+        single bubble), never the whole page.
+        """
+        self.window = window
+        self.page_size = page_size
+
+        self._older = deque(maxlen=max_history)     # oldest .. newest, not rendered
+        self.list_view = ft.ListView(spacing=12, width=width, height=height, auto_scroll=True)
+        self.load_earlier = ft.TextButton("Load earlier messages", visible=False, on_click=self._on_load_earlier)
+        self.control = ft.Column([self.load_earlier, self.list_view], spacing=4,
+                                 horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+
+    def __len__(self):
+        return len(self._older) + len(self.list_view.controls)
+
+    def _bubble(self, role, text):
+        label = ft.Text(text, selectable=True)
+        row = ft.Row(
+            [ft.Container(content=label, padding=10, border_radius=12, bgcolor=BUBBLE_COLORS.get(role, "#FFFFFF"))],
+            alignment=ft.MainAxisAlignment.END if role == "user" else ft.MainAxisAlignment.START,
+        )
+        row.data = (role, label)
+        return row
+
+    def add(self, role, text):
+        """
+        Appends a bubble and returns its ft.Text, so callers can fill it in
+        later (e.g. a streamed reply) with `set_text`.
+        """
+        row = self._bubble(role, text)
+        controls = self.list_view.controls
+        controls.append(row)
+
+        # Retire the oldest bubbles to plain text once over the window
+        overflow = len(controls) - self.window
+        if overflow > 0:
+            for old in controls[:overflow]:
+                old_role, old_label = old.data
+                self._older.append((old_role, old_label.value))
+            del controls[:overflow]
+            self.load_earlier.visible = True
+            self._refresh(self.load_earlier)
+
+        self._refresh(self.list_view)
+        return row.data[1]
+
+    def set_text(self, label, text):
+        """Replaces the text of one bubble, re-rendering only that control."""
+        label.value = text
+        self._refresh(label)
+
+    def clear(self):
+        self._older.clear()
+        self.list_view.controls.clear()
+        self.load_earlier.visible = False
+        self._refresh(self.control)
+
+    def _on_load_earlier(self, e):
+        count = min(self.page_size, len(self._older))
+        restored = [self._bubble(*self._older.pop()) for _ in range(count)]
+        restored.reverse()
+
+        # Prepending shouldn't yank the view back to the newest message
+        self.list_view.auto_scroll = False
+        self.list_view.controls[:0] = restored
+        self.load_earlier.visible = bool(self._older)
+        self._refresh(self.control)
+        self.list_view.auto_scroll = True
+
+    @staticmethod
+    def _refresh(control):
+        # Controls on a screen that isn't shown yet are sent with the screen
+        if control.page is not None:
+            control.update()
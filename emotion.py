@@ -0,0 +1,138 @@
+import re
+
+import numpy as np
+
+
+EMOTIONS = ["happy", "sad", "angry", "anxious", "neutral"]
+
+_TOKEN = re.compile(r"[a-z']+|[஀-௿]+")
+NEGATORS = {"not", "no", "never", "dont", "don't", "isnt", "isn't", "cant", "can't",
+             "wasnt", "wasn't", "nothing", "illa", "illai", "இல்லை"}
+_NEGATION_WINDOW = 3
+
+# word -> (emotion, weight). English, romanized Tamil and Tamil script.
+LEXICON = {
+    # happy
+    "happy": ("happy", 1.0), "glad": ("happy", 0.9), "great": ("happy", 0.8),
+    "good": ("happy", 0.5), "awesome": ("happy", 1.0), "excited": ("happy", 1.0),
+    "love": ("happy", 0.8), "fun": ("happy", 0.7), "joy": ("happy", 1.0),
+    "amazing": ("happy", 1.0), "fine": ("happy", 0.3), "okay": ("happy", 0.2),
+    "smile": ("happy", 0.8), "laugh": ("happy", 0.8), "proud": ("happy", 0.8),
+    "calm": ("happy", 0.5), "thanks": ("happy", 0.5), "santhosham": ("happy", 1.0),
+    "magizhchi": ("happy", 1.0), "மகிழ்ச்சி": ("happy", 1.0), "சந்தோஷம்": ("happy", 1.0),
+    # sad
+    "sad": ("sad", 1.0), "cry": ("sad", 1.0), "crying": ("sad", 1.0), "lonely": ("sad", 1.0),
+    "alone": ("sad", 0.7), "hurt": ("sad", 0.8), "miss": ("sad", 0.6), "tired": ("sad", 0.5),
+    "depressed": ("sad", 1.0), "upset": ("sad", 0.8), "tough": ("sad", 0.6),
+    "bad": ("sad", 0.6), "low": ("sad", 0.5), "heartbroken": ("sad", 1.0),
+    "sogam": ("sad", 1.0), "kavalai": ("sad", 0.8), "சோகம்": ("sad", 1.0),
+    "சோகமாக": ("sad", 1.0), "கவலை": ("sad", 0.8), "அழுகை": ("sad", 1.0),
+    # angry
+    "angry": ("angry", 1.0), "mad": ("angry", 0.8), "furious": ("angry", 1.0),
+    "annoyed": ("angry", 0.7), "hate": ("angry", 0.9), "frustrated": ("angry", 0.9),
+    "irritated": ("angry", 0.8), "unfair": ("angry", 0.6), "kobam": ("angry", 1.0),
+    "கோபம்": ("angry", 1.0), "கோபமாக": ("angry", 1.0), "எரிச்சல்": ("angry", 0.8),
+    # anxious
+    "anxious": ("anxious", 1.0), "worried": ("anxious", 0.9), "scared": ("anxious", 0.9),
+    "afraid": ("anxious", 0.9), "nervous": ("anxious", 0.9), "stress": ("anxious", 0.8),
+    "stressed": ("anxious", 0.9), "panic": ("anxious", 1.0), "fear": ("anxious", 0.9),
+    "exam": ("anxious", 0.4), "bayam": ("anxious", 1.0), "பயம்": ("anxious", 1.0),
+    "பயமாக": ("anxious", 1.0),
+}
+
+# Valence per emotion, used for the scalar polarity in [-1, 1]
+POLARITY = {"happy": 1.0, "sad": -1.0, "angry": -0.8, "anxious": -0.6, "neutral": 0.0}
+
+# Display colour per emotion (bear background / mood tint in the UI)
+COLORS = {"happy": "#FFE082", "sad": "#90CAF9", "angry": "#EF9A9A",
+          "anxious": "#CE93D8", "neutral": "#B3E5FC"}
+
+
+class EmotionClassifier:
+    def __init__(self, lexicon=LEXICON, emotions=EMOTIONS, min_score=0.25):
+        """
+        Lexicon-weighted linear scorer.
+
+        Each known word maps to one row of a (vocab x emotions) weight matrix;
+        a batch of messages is scored with a single scatter-add over all
+        token rows, so thousands of messages cost one NumPy pass. A negator
+        within three words before a term flips it towards "sad" for
+        positive words (e.g. "not happy") and cancels it otherwise.
+        """
+        self.emotions = list(emotions)
+        self.min_score = min_score
+        self._neutral = self.emotions.index("neutral")
+
+        self.vocab = {word: i for i, word in enumerate(lexicon)}
+        self.weights = np.zeros((len(self.vocab), len(self.emotions)), dtype=np.float32)
+        for word, (emotion, weight) in lexicon.items():
+            self.weights[self.vocab[word], self.emotions.index(emotion)] = weight
+
+        # Negated row: positive terms count as sad, everything else cancels
+        self.negated = np.zeros_like(self.weights)
+        happy, sad = self.emotions.index("happy"), self.emotions.index("sad")
+        self.negated[:, sad] = self.weights[:, happy] * 0.8
+
+        self.polarity = np.array([POLARITY[e] for e in self.emotions], dtype=np.float32)
+
+    def _tokenize(self, texts):
+        doc_ids, token_ids, negated, lengths = [], [], [], []
+        for doc, text in enumerate(texts):
+            tokens = _TOKEN.findall(text.lower())
+            lengths.append(len(tokens))
+            last_negator = -_NEGATION_WINDOW - 1
+            for pos, token in enumerate(tokens):
+                if token in NEGATORS:
+                    last_negator = pos
+                    continue
+                idx = self.vocab.get(token)
+                if idx is None:
+                    continue
+                doc_ids.append(doc)
+                token_ids.append(idx)
+                negated.append(pos - last_negator <= _NEGATION_WINDOW)
+        return (np.asarray(doc_ids, dtype=np.intp),
+                np.asarray(token_ids, dtype=np.intp),
+                np.asarray(negated, dtype=bool),
+                np.asarray(lengths, dtype=np.float32))
+
+    def score_batch(self, texts):
+        """
+        Returns an (n, len(emotions)) array of length-normalized scores.
+        """
+        doc_ids, token_ids, negated, lengths = self._tokenize(texts)
+
+        scores = np.zeros((len(texts), len(self.emotions)), dtype=np.float32)
+        if len(token_ids):
+            rows = np.where(negated[:, None], self.negated[token_ids], self.weights[token_ids])
+            np.add.at(scores, doc_ids, rows)
+
+        # Dampen long messages so one keyword in a paragraph isn't decisive
+        scores /= np.power(np.maximum(lengths, 1.0), 0.25)[:, None]
+        return scores
+
+    def classify_batch(self, texts):
+        """
+        Returns (labels, polarities) for a list of messages.
+        """
+        if not texts:
+            return [], []
+
+        scores = self.score_batch(texts)
+        best = scores.argmax(axis=1)
+        confident = scores[np.arange(len(texts)), best] >= self.min_score
+        best = np.where(confident, best, self._neutral)
+
+        totals = scores.sum(axis=1)
+        polarity = np.divide(scores @ self.polarity, totals,
+                             out=np.zeros_like(totals), where=totals > 0)
+
+        labels = [self.emotions[i] for i in best]
+        return labels, np.round(np.clip(polarity, -1.0, 1.0).astype(np.float64), 3).tolist()
+
+    def classify(self, text):
+        labels, polarities = self.classify_batch([text])
+        return labels[0], polarities[0]
+
+
+emotion_classifier = EmotionClassifier()
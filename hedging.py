@@ -0,0 +1,76 @@
+import os
+import asyncio
+
+
+CHAT_BUDGET_MS = int(os.getenv("CHAT_BUDGET_MS", "8000"))
+CHAT_HEDGE_MS = int(os.getenv("CHAT_HEDGE_MS", "0")) or None
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+async def hedged(make_call, budget, hedge_after=None, fallback=None, fatal=()):
+    """
+    Runs `make_call()` under a latency budget (seconds).
+
+    - If it hasn't answered after `hedge_after` seconds (or fails early),
+      a second identical call is started; the first success wins.
+    - Once `budget` is spent, every attempt still running is cancelled and
+      `fallback()` supplies the answer instead.
+
+    Returns (result, source) with source "primary", "hedge" or "fallback".
+    Without a fallback, raises the last upstream error or DeadlineExceeded.
+    Exceptions of a `fatal` type (e.g. admission-control rejections) are
+    re-raised as soon as no other attempt is still running.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    hedge_at = None
+    if hedge_after is not None and hedge_after < budget:
+        hedge_at = loop.time() + hedge_after
+
+    tasks = {asyncio.create_task(make_call()): "primary"}
+    error = None
+
+    try:
+        while True:
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            if tasks:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=max(0.0, wake - loop.time()),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    source = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result(), source
+                    error = task.exception()
+                    if isinstance(error, fatal) and not tasks:
+                        raise error
+
+            now = loop.time()
+            if now >= deadline:
+                break
+
+            # Hedge when the timer fires, or straight away if the primary failed
+            if hedge_at is not None and (now >= hedge_at or not tasks):
+                tasks[asyncio.create_task(make_call())] = "hedge"
+                hedge_at = None
+            elif not tasks:
+                break
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if fallback is not None:
+        return fallback(), "fallback"
+    raise error or DeadlineExceeded(f"No reply within {budget:.2f}s.")
+
+
+def budget_seconds(budget_ms=None, hedge_ms=None):
+    """Per-request overrides (milliseconds) on top of the env defaults."""
+    budget = (budget_ms or CHAT_BUDGET_MS) / 1000
+    hedge = hedge_ms if hedge_ms is not None else CHAT_HEDGE_MS
+    return budget, (hedge / 1000 if hedge else None)
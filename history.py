@@ -0,0 +1,200 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import deque
+
+
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join("data", "history.db"))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.5"))
+HISTORY_MAX_PENDING = int(os.getenv("HISTORY_MAX_PENDING", "50000"))
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "90"))
+HISTORY_COMPACT_INTERVAL = float(os.getenv("HISTORY_COMPACT_INTERVAL", "3600"))
+HISTORY_PAGE_MAX = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     TEXT NOT NULL,
+    role        TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    emotion     TEXT,
+    source      TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_user ON messages (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created_at);
+"""
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_DB, max_pending=HISTORY_MAX_PENDING):
+        """
+        Append-only chat history in SQLite (WAL mode).
+
+        `add_turn` only queues rows in memory; a background flusher writes
+        them in one transaction per batch, so persisting a turn costs the
+        request path nothing but a deque append. Reads page backwards from
+        the newest message, using the row id as the cursor.
+        """
+        self.path = path
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()       # guards _pending
+        self._db_lock = threading.Lock()    # one connection, used from worker threads
+        self._conn = None
+
+        self.written = 0
+        self.dropped = 0
+        self.compacted = 0
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")      # other worker processes share the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")   # durable at checkpoints; WAL keeps it consistent
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # -----------------------------------------------------------
+    # WRITES
+    # -----------------------------------------------------------
+    def add_turn(self, user_id, text, reply, emotion=None, source=None):
+        now = time.time()
+        with self._lock:
+            self.dropped += self._overflow(2)
+            self._pending.append((user_id, "user", text, emotion, None, now))
+            self._pending.append((user_id, "assistant", reply, None, source, now))
+
+    def _overflow(self, count):
+        """Rows the bounded queue will evict when `count` more are added."""
+        return max(0, len(self._pending) + count - self._pending.maxlen)
+
+    def flush(self):
+        """Writes every queued row in one transaction. Returns the row count."""
+        # Batches are taken under the db lock so a flush (e.g. from `page`)
+        # never returns while an earlier batch is still being committed
+        with self._db_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                rows = list(self._pending)
+                self._pending.clear()
+
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO messages (user_id, role, text, emotion, source, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Put the batch back (ahead of newer rows) for the next flush;
+                # a full queue loses its newest rows off the right end
+                with self._lock:
+                    self.dropped += self._overflow(len(rows))
+                    self._pending.extendleft(reversed(rows))
+                raise
+
+        self.written += len(rows)
+        return len(rows)
+
+    async def run_flusher(self, interval=HISTORY_FLUSH_INTERVAL, compact_interval=HISTORY_COMPACT_INTERVAL):
+        """
+        Flushes queued rows every `interval` seconds and compacts every
+        `compact_interval`. Call `close()` after cancelling it.
+        """
+        next_compact = time.monotonic() + compact_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+                if time.monotonic() >= next_compact:
+                    removed = await asyncio.to_thread(self.compact)
+                    if removed:
+                        print(f"[HISTORY] Compacted {removed} messages.")
+                    next_compact = time.monotonic() + compact_interval
+            except Exception as e:
+                print(f"History flusher error: {e}")
+
+    # -----------------------------------------------------------
+    # READS
+    # -----------------------------------------------------------
+    def page(self, user_id, before=None, limit=50):
+        """
+        Returns (messages, next_cursor): up to `limit` messages older than
+        the cursor `before` (newest page when None), in chronological order.
+        `next_cursor` is None once the oldest message has been returned.
+        """
+        self.flush()    # read-your-writes for turns still queued
+        limit = max(1, min(limit, HISTORY_PAGE_MAX))
+
+        query = "SELECT id, role, text, emotion, source, created_at FROM messages WHERE user_id = ?"
+        params = [user_id]
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._db_lock:
+            rows = self._connect().execute(query, params).fetchall()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        messages = [
+            {"id": r[0], "role": r[1], "text": r[2], "emotion": r[3], "source": r[4], "created_at": r[5]}
+            for r in rows
+        ]
+        return messages, (rows[0][0] if more else None)
+
+    # -----------------------------------------------------------
+    # RETENTION
+    # -----------------------------------------------------------
+    def compact(self, retention_days=HISTORY_RETENTION_DAYS):
+        """
+        Deletes messages older than `retention_days` and truncates the WAL.
+        Returns the number of rows removed.
+        """
+        cutoff = time.time() - retention_days * 86400
+        with self._db_lock:
+            conn = self._connect()
+            removed = conn.execute("DELETE FROM messages WHERE created_at < ?", (cutoff,)).rowcount
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compacted += removed
+        return removed
+
+    def clear(self, user_id):
+        with self._lock:
+            kept = [row for row in self._pending if row[0] != user_id]
+            self._pending.clear()
+            self._pending.extend(kept)
+        with self._db_lock:
+            self._connect().execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "written": self.written,
+            "dropped": self.dropped,
+            "compacted": self.compacted,
+        }
@@ -0,0 +1,102 @@
+import io
+import os
+import base64
+import threading
+from collections import OrderedDict
+
+import flet as ft
+
+try:
+    # Optional: downscales images to their display size before caching
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Shown when an image is missing: bundled with Flet, needs no file or network
+FALLBACK_ICON = ft.icons.PETS
+FALLBACK_COLOR = "#9CC9E3"
+
+
+class ImageCache:
+    def __init__(self, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        """
+        Shared, size-bounded LRU of base64-encoded images.
+
+        Each (path, size) is read, optionally downscaled and encoded once;
+        every screen showing it reuses the same string. Missing files give a
+        local icon placeholder instead of a remote URL, so the UI works
+        offline.
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (path, max_side) -> base64 str
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, max_side=None):
+        """Returns the base64 payload for `path`, or None if it can't be read."""
+        if not path:
+            return None
+
+        key = (path, max_side)
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+
+        encoded = self._load(path, max_side)
+        if encoded is None:
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = encoded
+                self._bytes += len(encoded)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return encoded
+
+    def image(self, path, width, height, fit=ft.ImageFit.CONTAIN):
+        """An ft.Image for `path`, or the fallback icon when unavailable."""
+        encoded = self.get(path, max(width, height))
+        if encoded is None:
+            return ft.Icon(FALLBACK_ICON, size=min(width, height) * 0.6, color=FALLBACK_COLOR)
+        return ft.Image(src_base64=encoded, width=width, height=height, fit=fit)
+
+    @staticmethod
+    def _load(path, max_side):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        if PILImage is not None and max_side:
+            try:
+                with PILImage.open(io.BytesIO(data)) as img:
+                    if max(img.size) > max_side:
+                        img.thumbnail((max_side, max_side))
+                        buffer = io.BytesIO()
+                        img.save(buffer, format="PNG", optimize=True)
+                        data = buffer.getvalue()
+            except Exception as e:
+                print(f"Image downscale failed for {path}: {e}")
+
+        return base64.b64encode(data).decode()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+image_cache = ImageCache()
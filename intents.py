@@ -0,0 +1,247 @@
+import re
+import random
+from collections import deque
+
+from emotion import emotion_classifier, NEGATORS
+
+
+INTENT_CONFIDENCE = 0.75
+
+# Words that don't change what a short check-in means ("hi buddy", "I feel sad")
+FILLER_WORDS = {
+    "i", "im", "i'm", "am", "a", "so", "very", "really", "just", "feel", "feeling", "me",
+    "you", "please", "buddy", "friend", "magizh", "magizhbuddy", "there", "today", "now",
+    "much", "bit", "little", "kinda", "tell", "again", "too", "oh", "ok", "okay",
+}
+
+# Messages that must always reach the model (and never get a canned intent reply)
+_RISK = re.compile(
+    r"\b(die|dying|dead|death|kill|suicid\w*|hurt (myself|me)|self[- ]?harm|cut myself|end it|"
+    r"passed away|abuse\w*|hit me|hits me|unsafe|scared|panic\w*)\b"
+)
+
+_TAMIL = re.compile(r"[஀-௿]")
+_NON_WORD = re.compile(r"[^\w஀-௿']+")
+_PULLI = "\u0bcd"
+
+
+# Trigger phrases per intent (English, romanized Tamil and Tamil script)
+# and the local replies used when the match is confident enough.
+INTENTS = {
+    "greeting": {
+        "triggers": ["hi", "hello", "hey", "hii", "good morning", "good evening",
+                     "vanakkam", "வணக்கம்", "ஹாய்"],
+        "replies": {
+            "en": ["Hi friend! I'm so happy you're here. How are you feeling today?",
+                   "Hello! MagizhBuddy is all ears. What's on your mind?"],
+            "ta": ["வணக்கம் நண்பா! இன்று எப்படி உணர்கிறாய்?"],
+        },
+    },
+    "joke": {
+        "triggers": ["joke", "jokes", "comedy", "make me laugh", "something funny",
+                     "sirippu", "nagaichuvai", "ஜோக்", "நகைச்சுவை", "சிரிப்பு"],
+        "replies": {
+            "en": ["Why did the teddy bear skip dessert? Because it was already stuffed!",
+                   "What do you call a bear with no teeth? A gummy bear!",
+                   "Why don't polar bears wear socks? They like to bear their feet!"],
+            "ta": ["கரடிக்கு ஏன் பல் டாக்டர் பிடிக்கும்? ஏனென்றால் அவர் 'கரடி'யாக பேசமாட்டார்! 😄"],
+        },
+    },
+    "sad": {
+        "triggers": ["sad", "cry", "crying", "lonely", "upset", "feel low", "feeling low",
+                     "heartbroken", "kavalai", "sogam", "அழுகை", "சோகம்", "கவலை"],
+        "replies": {
+            "en": ["I'm really sorry you're feeling this way. I'm right here with you, and it's okay to feel sad.",
+                   "That sounds heavy. You don't have to carry it alone — I'm here and I'm listening."],
+            "ta": ["நீ இப்படி உணர்வது எனக்கு வருத்தமாக இருக்கிறது. நான் உன்னுடன் இருக்கிறேன்."],
+        },
+    },
+    "angry": {
+        "triggers": ["angry", "furious", "mad at", "annoyed", "frustrated",
+                     "kobam", "கோபம்", "எரிச்சல்"],
+        "replies": {
+            "en": ["Let's take a breath together: in for 4, hold for 4, out for 4. I'm right here.",
+                   "Anger is okay to feel. Try breathing in slowly... and out even slower. Want to tell me what happened?"],
+            "ta": ["சேர்ந்து மூச்சு விடலாம்: நான்கு எண்ணிக்கை உள்ளே, நான்கு நிறுத்தி, நான்கு வெளியே."],
+        },
+    },
+    "thanks": {
+        "triggers": ["thanks", "thank you", "thank u", "nandri", "நன்றி"],
+        "replies": {
+            "en": ["Anytime! I'm always here for you. 🐻"],
+            "ta": ["எப்போதும் உனக்காக இருக்கிறேன்! 🐻"],
+        },
+    },
+}
+
+# Canned replies by detected emotion, used when the LLM misses its deadline
+FALLBACK_REPLIES = {
+    "sad": "I'm right here with you. Whatever you're feeling is okay, and you don't have to face it alone.",
+    "angry": "That sounds really frustrating. Let's take one slow, deep breath together.",
+    "anxious": "It's okay to feel worried. Let's slow down together: breathe in... and out.",
+    "happy": "I love hearing that! Tell me more — what made it so good?",
+    "neutral": "I'm here and listening. Tell me a little more?",
+    "risk": ("I'm really glad you told me. You matter, and you don't have to go through this alone. "
+             "If you might be in danger, please reach out to someone you trust or a local helpline right now."),
+}
+
+# Intents that a message with this (negative) emotion may still be answered with
+_EMOTION_INTENTS = {"sad": {"sad", "thanks"}, "angry": {"angry", "thanks"}, "anxious": set()}
+
+
+class IntentEngine:
+    def __init__(self, intents=INTENTS, threshold=INTENT_CONFIDENCE):
+        """
+        Compiles every trigger phrase into one Aho-Corasick automaton, so a
+        message is matched against all intents in a single pass.
+
+        Matching runs on normalized text padded with spaces. Latin phrases
+        are anchored on both sides (whole words only); Tamil phrases only at
+        the start, and a final pulli consonant is dropped from the stem, so
+        inflected forms like "சோகமாக" still match "சோகம்".
+        """
+        self.intents = intents
+        self.threshold = threshold
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]      # state -> [(intent, phrase)]
+
+        for name, spec in intents.items():
+            for phrase in spec["triggers"]:
+                self._add(self._pattern(phrase), (name, phrase))
+        self._build_failure_links()
+
+    @staticmethod
+    def normalize(text):
+        return " " + _NON_WORD.sub(" ", text.lower()).strip() + " "
+
+    def _pattern(self, phrase):
+        phrase = self.normalize(phrase).rstrip()
+        if not _TAMIL.search(phrase):
+            return phrase + " "
+        if phrase.endswith(_PULLI) and len(phrase) > 4:
+            phrase = phrase[:-2]
+        return phrase
+
+    # -----------------------------------------------------------
+    # AUTOMATON
+    # -----------------------------------------------------------
+    def _add(self, pattern, output):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(output)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def scan(self, text):
+        """Returns every (intent, phrase) hit in `text`, in one pass."""
+        hits = []
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in self.normalize(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.extend(out[state])
+        return hits
+
+    # -----------------------------------------------------------
+    # CLASSIFY / REPLY
+    # -----------------------------------------------------------
+    def match(self, text):
+        """
+        Returns (intent, confidence) for the best intent, or (None, 0.0).
+
+        Confidence is the share of the message's words covered by the
+        matched triggers (plus filler words), so a trigger inside a longer
+        message ("hi, my grandma passed away") scores low. It drops further
+        when several intents compete.
+        """
+        hits = self.scan(text)
+        if not hits:
+            return None, 0.0
+
+        scores = {}
+        for name, _ in hits:
+            scores[name] = scores.get(name, 0) + 1
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best, best_score = ranked[0]
+
+        stems = [self._pattern(phrase).split() for name, phrase in hits if name == best]
+        stems = {stem for phrase in stems for stem in phrase}
+        words = self.normalize(text).split()
+        covered = sum(
+            1 for word in words
+            if word in FILLER_WORDS or word in stems
+            or (_TAMIL.search(word) and any(word.startswith(stem) for stem in stems if _TAMIL.search(stem)))
+        )
+        confidence = covered / max(len(words), 1)
+        if len(ranked) > 1:
+            confidence *= best_score / (best_score + ranked[1][1])
+        return best, round(confidence, 3)
+
+    @staticmethod
+    def is_risky(text):
+        return bool(_RISK.search(text.lower()))
+
+    def reply(self, text):
+        """
+        Returns (intent, reply) when a local answer is confident and safe,
+        otherwise None so the caller falls through to the LLM.
+
+        Never answers locally when the message mentions risk, contains a
+        negation ("I'm not sad anymore") or carries a negative emotion the
+        intent doesn't address (a greeting for "hello I want to die").
+        """
+        intent, confidence = self.match(text)
+        if intent is None or confidence < self.threshold or self.is_risky(text):
+            return None
+
+        words = set(self.normalize(text).split())
+        if words & NEGATORS:
+            return None
+
+        emotion, _ = emotion_classifier.classify(text)
+        if emotion in _EMOTION_INTENTS and intent not in _EMOTION_INTENTS[emotion]:
+            return None
+
+        language = "ta" if _TAMIL.search(text) else "en"
+        replies = self.intents[intent]["replies"]
+        return intent, random.choice(replies.get(language) or replies["en"])
+
+    def fallback_reply(self, text, emotion="neutral"):
+        """
+        Local answer for when the model can't be reached: the safe intent
+        reply if there is one, else a canned reply for `emotion` (or the
+        support message for risky messages).
+        """
+        if self.is_risky(text):
+            return FALLBACK_REPLIES["risk"]
+
+        local = self.reply(text)
+        if local:
+            return local[1]
+        return FALLBACK_REPLIES.get(emotion, FALLBACK_REPLIES["neutral"])
+
+
+intent_engine = IntentEngine()
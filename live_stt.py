@@ -0,0 +1,294 @@
+import asyncio
+import random
+
+from deepgram import LiveTranscriptionEvents
+
+
+KEEPALIVE_INTERVAL = 5.0      # Deepgram closes idle sockets after ~10 s
+MAX_BACKOFF = 30.0
+SEND_QUEUE_FRAMES = 250       # ~5 s of 20 ms frames waiting for the socket
+
+
+class LiveConnection:
+    def __init__(self, connection):
+        """
+        One open Deepgram live socket. Events are forwarded to whichever
+        session currently holds it (`handler`), so the socket can be reused.
+        """
+        self.connection = connection
+        self.handler = None
+        self.alive = True
+
+    async def _dispatch(self, kind, result=None):
+        if self.handler:
+            await self.handler(kind, result)
+
+    async def send(self, data):
+        await self.connection.send(data)
+
+    async def keep_alive(self):
+        return await self.connection.keep_alive()
+
+    async def finish(self):
+        self.alive = False
+        try:
+            await self.connection.finish()
+        except Exception as e:
+            print(f"Error closing connection: {e}")
+
+
+class DeepgramLiveManager:
+    def __init__(self, client, options, pool_size=1, keepalive_interval=KEEPALIVE_INTERVAL):
+        """
+        Keeps `pool_size` warm Deepgram live connections open between
+        sessions (KeepAlive every `keepalive_interval` seconds) and reopens
+        dropped ones with jittered exponential backoff. Sessions borrow a
+        connection with `acquire()` and hand it back with `release()`.
+        """
+        self.client = client
+        self.options = options
+        self.pool_size = pool_size
+        self.keepalive_interval = keepalive_interval
+
+        self._idle = []
+        self._lock = asyncio.Lock()
+        self._keepalive_task = None
+
+        self.opened = 0
+        self.reused = 0
+        self.reconnects = 0
+
+    # -----------------------------------------------------------
+    # LIFECYCLE
+    # -----------------------------------------------------------
+    async def start(self):
+        if self._keepalive_task:
+            return
+        await self._refill()
+        self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+    async def close(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        async with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.finish()
+
+    # -----------------------------------------------------------
+    # BORROW / RETURN
+    # -----------------------------------------------------------
+    async def acquire(self):
+        async with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if conn.alive:
+                    self.reused += 1
+                    return conn
+        return await self._open_with_backoff()
+
+    async def release(self, conn):
+        conn.handler = None
+        if not conn.alive:
+            return
+        async with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        await conn.finish()
+
+    # -----------------------------------------------------------
+    # INTERNALS
+    # -----------------------------------------------------------
+    async def _open(self):
+        connection = self.client.listen.asynclive.v("1")
+        conn = LiveConnection(connection)
+
+        async def on_transcript(_, result, **kwargs):
+            await conn._dispatch("transcript", result)
+
+        async def on_utterance_end(_, result, **kwargs):
+            await conn._dispatch("utterance_end", result)
+
+        async def on_close(_, *args, **kwargs):
+            conn.alive = False
+            await conn._dispatch("close")
+
+        async def on_error(_, error, **kwargs):
+            print(f"Deepgram live error: {error}")
+            conn.alive = False
+            await conn._dispatch("close")
+
+        connection.on(LiveTranscriptionEvents.Transcript, on_transcript)
+        connection.on(LiveTranscriptionEvents.UtteranceEnd, on_utterance_end)
+        connection.on(LiveTranscriptionEvents.Close, on_close)
+        connection.on(LiveTranscriptionEvents.Error, on_error)
+
+        if not await connection.start(self.options):
+            raise ConnectionError("Deepgram live connection failed to start.")
+
+        self.opened += 1
+        return conn
+
+    async def _open_with_backoff(self, attempts=5):
+        delay = 0.5
+        for attempt in range(attempts):
+            try:
+                return await self._open()
+            except Exception as e:
+                if attempt == attempts - 1:
+                    raise
+                self.reconnects += 1
+                wait = min(delay, MAX_BACKOFF) * (0.5 + random.random())
+                print(f"Deepgram connect failed ({e}); retrying in {wait:.1f}s")
+                await asyncio.sleep(wait)
+                delay *= 2
+
+    async def _refill(self):
+        async with self._lock:
+            self._idle = [c for c in self._idle if c.alive]
+            missing = self.pool_size - len(self._idle)
+        for _ in range(missing):
+            try:
+                conn = await self._open_with_backoff()
+            except Exception as e:
+                print(f"Could not warm Deepgram connection: {e}")
+                return
+            async with self._lock:
+                self._idle.append(conn)
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            async with self._lock:
+                idle = list(self._idle)
+            for conn in idle:
+                try:
+                    if await conn.keep_alive() is False:
+                        conn.alive = False
+                except Exception:
+                    conn.alive = False
+            await self._refill()
+
+    def stats(self):
+        return {
+            "idle": len(self._idle),
+            "opened": self.opened,
+            "reused": self.reused,
+            "reconnects": self.reconnects,
+        }
+
+
+class LiveSession:
+    def __init__(self, manager, callback, max_duration=15.0, max_queued_frames=SEND_QUEUE_FRAMES):
+        """
+        One transcription session on a borrowed connection. Ends on the first
+        final transcript at end of speech (or UtteranceEnd), on stop(), or
+        after `max_duration` seconds as a safety cap. Only a session that
+        ended at end of speech returns its connection to the pool.
+
+        `await callback(transcript, final)` is called for every interim
+        result (final=False) and every final one (final=True).
+
+        Frames are pushed from the capture thread with `send_threadsafe`.
+        At most `max_queued_frames` wait for the socket; while it is stalled
+        newer frames are dropped and counted in `frames_dropped`.
+        """
+        self.manager = manager
+        self.callback = callback
+        self.max_duration = max_duration
+
+        self.loop = None
+        self.active = False
+        self.transcripts = []
+        self.frames_dropped = 0
+        self._ended_cleanly = False     # saw end of speech, nothing left in flight
+        self._frames = asyncio.Queue(maxsize=max_queued_frames)
+        self._done = asyncio.Event()
+
+        # Filled in by whoever feeds the session (see AudioEngine)
+        self.capture = None
+        self.capture_metrics = {}
+
+    def send_threadsafe(self, data):
+        if self.active:
+            self.loop.call_soon_threadsafe(self._enqueue, data)
+
+    def _enqueue(self, data):
+        try:
+            self._frames.put_nowait(data)
+        except asyncio.QueueFull:
+            self.frames_dropped += 1
+
+    def stop(self):
+        if self.loop and self.active:
+            self.loop.call_soon_threadsafe(self._done.set)
+
+    async def run(self, on_started=None):
+        self.loop = asyncio.get_running_loop()
+        conn = await self.manager.acquire()
+        conn.handler = self._on_event
+        self.active = True
+
+        sender = asyncio.create_task(self._send_frames(conn))
+        try:
+            if on_started:
+                on_started(self)
+            await asyncio.wait_for(self._done.wait(), self.max_duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.active = False
+            sender.cancel()
+            # Cut off mid-utterance (stop() or max_duration): Deepgram may
+            # still send results for it, which must not reach the next
+            # session, so close the connection instead of pooling it
+            if not self._ended_cleanly:
+                conn.handler = None
+                await conn.finish()
+            await self.manager.release(conn)
+
+        return " ".join(self.transcripts)
+
+    async def _send_frames(self, conn):
+        while True:
+            # The VAD holds back silence, so keep the socket alive ourselves
+            # while the user hasn't started speaking yet
+            try:
+                data = await asyncio.wait_for(self._frames.get(), self.manager.keepalive_interval)
+            except asyncio.TimeoutError:
+                data = None
+            try:
+                if data is None:
+                    await conn.keep_alive()
+                else:
+                    await conn.send(data)
+            except Exception as e:
+                print(f"Deepgram send failed: {e}")
+                conn.alive = False
+                self._done.set()
+                return
+
+    async def _on_event(self, kind, result):
+        if kind == "close" or kind == "utterance_end":
+            self._ended_cleanly = kind == "utterance_end"
+            self._done.set()
+            return
+
+        transcript = ""
+        try:
+            transcript = result.channel.alternatives[0].transcript
+        except Exception:
+            pass
+
+        if transcript and not result.is_final:
+            await self.callback(transcript, False)
+        elif transcript:
+            print(f"[LIVE TRANSCRIPT] {transcript}")
+            self.transcripts.append(transcript)
+            await self.callback(transcript, True)
+
+        if result.is_final and getattr(result, "speech_final", False) and self.transcripts:
+            self._ended_cleanly = True
+            self._done.set()
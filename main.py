@@ -1,17 +1,157 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import uvicorn
 import os
+import json
+import argparse
+import asyncio
+import time
+import importlib
+import httpx
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-from openai import OpenAI
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from memory import ConversationMemory, SharedConversationMemory
+from history import HistoryStore
+from cache import ResponseCache, SharedResponseCache, make_key
+from uploads import spool_upload, UploadLimitMiddleware
+from audio_prep import prepare_audio
+from intents import intent_engine
+from emotion import emotion_classifier
+from scheduler import FairScheduler, UPSTREAM_MAX_CONCURRENCY
+from hedging import hedged, budget_seconds
+from tts_cache import tts_cache, AUDIO_DIR
+import metrics
+import shared_state
+from metrics import stage
+
+MODEL = "gpt-4o-mini"
+TEXT_SYSTEM_PROMPT = "You are MagizhBuddy, a friendly emotional companion."
+VOICE_SYSTEM_PROMPT = "You are MagizhBuddy, a fun emotional companion."
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))
+WARMUP_RETRY_MAX = 60.0
+# Backends that must have warmed up before /ready reports 200
+REQUIRED_BACKENDS = [b for b in os.getenv("REQUIRED_BACKENDS", "openai,voice").split(",") if b]
+
+# Built during warmup (see lifespan) so importing this module stays cheap:
+# - client: AsyncOpenAI on one pooled keep-alive httpx client
+# - voice_service: Deepgram-backed STT/TTS (heavy SDK import)
+http_client = None
+client = None
+voice_service = None
+
+# With several worker processes, sessions and cached replies live in the
+# shared SQLite store so any worker can serve any user (see shared_state.py)
+SHARED = shared_state.enabled()
+
+# Recent turns per user_id, bounded per user and across all users
+memory = SharedConversationMemory() if SHARED else ConversationMemory()
+history = HistoryStore()
+
+# Replies for near-identical check-ins ("hi", "I feel sad", ...)
+response_cache = SharedResponseCache() if SHARED else ResponseCache()
+
+# Admission control per upstream: bounded concurrency, fair per-user queues.
+# The concurrency budget is split across workers so the total stays the same.
+UPSTREAM_CONCURRENCY_PER_WORKER = max(1, UPSTREAM_MAX_CONCURRENCY // shared_state.WORKERS)
+llm_scheduler = FairScheduler("OpenAI", max_concurrency=UPSTREAM_CONCURRENCY_PER_WORKER)
+voice_scheduler = FairScheduler("Deepgram", max_concurrency=UPSTREAM_CONCURRENCY_PER_WORKER)
+
+
+
+# -----------------------------
+# STARTUP / WARMUP
+# -----------------------------
+async def warm_openai():
+    """Imports the OpenAI SDK, opens its connection pool and pings the API."""
+    global http_client, client
+    if client is None:
+        openai = await asyncio.to_thread(importlib.import_module, "openai")
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+        client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    # Opens (and keeps alive) the TLS connection the first chat will reuse
+    await asyncio.wait_for(client.models.list(), WARMUP_TIMEOUT)
+
+
+async def warm_voice():
+    """Imports the voice backend and pre-synthesizes the greeting (TTS cache)."""
+    global voice_service
+    if voice_service is None:
+        module = await asyncio.to_thread(importlib.import_module, "voice_service")
+        voice_service = module.voice_service
+    await asyncio.wait_for(voice_service.warmup(), WARMUP_TIMEOUT)
+
+
+WARMUP_STEPS = {"openai": warm_openai, "voice": warm_voice}
+
+
+async def warm_up(app):
+    """
+    Runs in the background after the server starts listening. Steps that
+    fail are retried with backoff until they succeed; `/ready` stays 503
+    while any backend in REQUIRED_BACKENDS is not "ok".
+    """
+    status = app.state.warmup
+    delay = WARMUP_RETRY_INTERVAL
+
+    while True:
+        for name, step in WARMUP_STEPS.items():
+            if status[name] == "ok":
+                continue
+            try:
+                await step()
+                status[name] = "ok"
+            except Exception as e:
+                status[name] = f"error: {e}"
+
+        print(f"Warmup finished: {status}")
+        if all(state == "ok" for state in status.values()):
+            return
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX)
+
+
+def is_ready(app):
+    return all(app.state.warmup.get(name) == "ok" for name in REQUIRED_BACKENDS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    app.state.warmup = {"openai": "pending", "voice": "pending"}
+
+    warmup = asyncio.create_task(warm_up(app))
+    janitor = asyncio.create_task(tts_cache.run_janitor())
+    flusher = asyncio.create_task(history.run_flusher())
+    yield
 
-app = FastAPI(title="AI Companion API", version="0.1.0")
+    warmup.cancel()
+    janitor.cancel()
+    flusher.cancel()
+    await asyncio.to_thread(history.close)
+    if client is not None:
+        await client.close()
+
+
+app = FastAPI(title="AI Companion API", version="0.1.0", lifespan=lifespan)
+
+# Refuse oversized uploads before the multipart body is parsed and spooled
+app.add_middleware(UploadLimitMiddleware, paths=["/chat/audio"])
 
 # CORS
 app.add_middleware(
@@ -22,13 +162,116 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from fastapi.staticfiles import StaticFiles
-os.makedirs("static/audio", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Tags the request with an id (X-Request-ID, generated if absent) that
+    every timed stage reports to trace hooks, and records total latency.
+    """
+    request_id = request.headers.get("x-request-id") or metrics.new_request_id()
+    token = metrics.request_id_var.set(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            path=route.path if route else "unmatched",
+            status=status
+        )
+        metrics.request_id_var.reset(token)
+
+
+# The directory is created in lifespan, before the first request
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
+
+MAX_EMOTION_BATCH = 10000
+
+
+class EmotionBatchRequest(BaseModel):
+    texts: list[str]
+
 
 class ChatRequest(BaseModel):
     text: str
     user_id: str = "default_user"
+    no_cache: bool = False
+    budget_ms: int | None = None    # hard latency ceiling for the reply
+    hedge_ms: int | None = None     # start a duplicate request after this long
+
+
+def require_llm():
+    if client is None:
+        raise HTTPException(status_code=503, detail="Language model is not available yet.",
+                            headers={"Retry-After": "1"})
+    return client
+
+
+def require_voice():
+    if voice_service is None or not voice_service.client:
+        raise HTTPException(status_code=503, detail="Voice backend is not available.",
+                            headers={"Retry-After": "1"})
+    return voice_service
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event frame."""
+    frame = f"data: {json.dumps(data)}\n\n"
+    if event:
+        frame = f"event: {event}\n" + frame
+    return frame
+
+
+async def off_loop(fn, *args):
+    """
+    Calls into memory/response_cache. The shared backends are SQLite and
+    may wait on another worker's write lock, so they run in a thread; the
+    in-process ones are cheap enough to call inline.
+    """
+    if SHARED:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+async def record_turn(user_id, text, reply, emotion=None, source=None):
+    """Adds a turn to the prompt memory and queues it for the history store."""
+    await off_loop(memory.add_turn, user_id, text, reply)
+    history.add_turn(user_id, text, reply, emotion=emotion, source=source)
+
+
+async def complete(user_id, messages, text, emotion, budget, hedge_after=None):
+    """
+    One completion under a latency budget, optionally hedged. Falls back to a
+    local intent/canned reply if the model misses the deadline.
+    Returns (reply, source).
+    """
+    llm = require_llm()
+
+    async def call():
+        async with llm_scheduler.slot(user_id):
+            with stage("llm_total", upstream="openai"):
+                ai_res = await llm.chat.completions.create(model=MODEL, messages=messages)
+        return ai_res.choices[0].message.content
+
+    return await hedged(
+        call,
+        budget,
+        hedge_after=hedge_after,
+        fallback=lambda: intent_engine.fallback_reply(text, emotion),
+        fatal=(HTTPException,),
+    )
+
+
+async def prepend(first, rest):
+    yield first
+    async for item in rest:
+        yield item
 
 
 @app.get("/")
@@ -41,27 +284,105 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    for name, scheduler in (("openai", llm_scheduler), ("deepgram", voice_scheduler)):
+        stats = scheduler.stats()
+        metrics.SCHEDULER_IN_FLIGHT.set(stats["in_flight"], upstream=name)
+        metrics.SCHEDULER_QUEUED.set(stats["queued"], upstream=name)
+    # Each worker process keeps its own registry; label its samples so the
+    # scraper can tell them apart (sum by everything but `worker` to aggregate)
+    const_labels = {"worker": os.getpid()} if shared_state.WORKERS > 1 else None
+    return PlainTextResponse(metrics.render(const_labels), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def readiness_check():
+    ready = is_ready(app)
+    body = {"ready": ready, "warmup": app.state.warmup}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"responses": await off_loop(response_cache.stats), "tts": tts_cache.stats()}
+
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return {"llm": llm_scheduler.stats(), "voice": voice_scheduler.stats()}
+
+
+# -----------------------------
+# CHAT HISTORY
+# -----------------------------
+@app.get("/chat/history")
+async def chat_history(user_id: str = "default_user", before: int | None = None, limit: int = 50):
+    """
+    Pages backwards through a user's stored messages. Pass `next_cursor`
+    from one response as `before` to get the page of older messages.
+    Turns served by other workers appear after their next flush.
+    """
+    messages, next_cursor = await asyncio.to_thread(history.page, user_id, before, limit)
+    return {"messages": messages, "next_cursor": next_cursor}
+
+
 # -----------------------------
 # TEXT CHAT ENDPOINT
 # -----------------------------
 @app.post("/chat/text")
 async def chat_text(request: ChatRequest):
     try:
-        ai_res = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are MagizhBuddy, a friendly emotional companion."},
-                {"role": "user", "content": request.text}
-            ]
-        )
+        emotion, _ = emotion_classifier.classify(request.text)
+
+        # Fast path: confident local intents never touch the network
+        local = intent_engine.reply(request.text)
+        if local:
+            intent, reply = local
+            await record_turn(request.user_id, request.text, reply, emotion, "intent")
+            return {
+                "response": reply,
+                "emotion": emotion,
+                "cached": False,
+                "intent": intent,
+                "source": "intent"
+            }
+
+        # The key covers the user's remembered context, so a reply is never
+        # served to a user whose conversation differs from the one it answered
+        messages = await off_loop(memory.build_messages, request.user_id, TEXT_SYSTEM_PROMPT, request.text)
+        cache_key = make_key(request.text, TEXT_SYSTEM_PROMPT, MODEL, messages[1:-1])
+        reply = None if request.no_cache else await off_loop(response_cache.get, cache_key)
+        cached = reply is not None
+        source = "cache"
 
-        reply = ai_res.choices[0].message["content"]
+        if not cached:
+            budget, hedge_after = budget_seconds(request.budget_ms, request.hedge_ms)
+            reply, source = await complete(
+                request.user_id,
+                messages,
+                request.text,
+                emotion,
+                budget,
+                hedge_after
+            )
+            # Fallbacks are a stopgap, not an answer worth reusing
+            if source != "fallback":
+                await off_loop(response_cache.set, cache_key, reply)
+
+        await record_turn(request.user_id, request.text, reply, emotion, source)
 
         return {
             "response": reply,
-            "emotion": "positive"
+            "emotion": emotion,
+            "cached": cached,
+            "intent": None,
+            "source": source
         }
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         return {
             "response": "I am listening but my brain is not connected to drive. Check API key.",
@@ -69,45 +390,161 @@ async def chat_text(request: ChatRequest):
         }
 
 
+# -----------------------------
+# STREAMING TEXT CHAT ENDPOINT (SSE)
+# -----------------------------
+@app.post("/chat/text/stream")
+async def chat_text_stream(request: ChatRequest):
+    """
+    Streams the reply as Server-Sent Events: one `data: {"token": ...}` frame
+    per delta, then an `event: done` frame (or `event: error`).
+    """
+    emotion, _ = emotion_classifier.classify(request.text)
+
+    local = intent_engine.reply(request.text)
+    if local:
+        intent, reply = local
+        await record_turn(request.user_id, request.text, reply, emotion, "intent")
+
+        async def local_stream():
+            yield sse_event({"token": reply})
+            yield sse_event({"emotion": emotion, "intent": intent, "source": "intent"}, event="done")
+
+        return StreamingResponse(local_stream(), media_type="text/event-stream")
+
+    # Admit before the response starts so overload can still be a 429/503;
+    # the slot is held for the whole stream and released once it ends.
+    llm = require_llm()
+    started = await llm_scheduler.acquire(request.user_id)
+
+    budget, _ = budget_seconds(request.budget_ms)
+
+    async def event_stream():
+        started_at = time.perf_counter()
+        try:
+            stream = await llm.chat.completions.create(
+                model=MODEL,
+                messages=await off_loop(memory.build_messages, request.user_id, TEXT_SYSTEM_PROMPT, request.text),
+                stream=True
+            )
+
+            # The budget bounds time-to-first-token; once tokens flow we stream on
+            chunks = stream.__aiter__()
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), budget)
+                metrics.record("llm_ttft", time.perf_counter() - started_at)
+            except asyncio.TimeoutError:
+                metrics.UPSTREAM_ERRORS.inc(upstream="openai", error="DeadlineExceeded")
+                await stream.close()
+                reply = intent_engine.fallback_reply(request.text, emotion)
+                await record_turn(request.user_id, request.text, reply, emotion, "fallback")
+                yield sse_event({"token": reply})
+                yield sse_event({"emotion": emotion, "source": "fallback"}, event="done")
+                return
+
+            tokens = []
+            async for chunk in prepend(first, chunks):
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    tokens.append(token)
+                    yield sse_event({"token": token})
+
+            metrics.record("llm_total", time.perf_counter() - started_at)
+            await record_turn(request.user_id, request.text, "".join(tokens), emotion, "primary")
+
+            yield sse_event({"emotion": emotion, "source": "primary"}, event="done")
+
+        except Exception as e:
+            metrics.UPSTREAM_ERRORS.inc(upstream="openai", error=type(e).__name__)
+            yield sse_event({
+                "response": "I am listening but my brain is not connected to drive. Check API key.",
+                "error": str(e)
+            }, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(llm_scheduler.release, started)
+    )
+
+
+# -----------------------------
+# BATCH EMOTION SCORING
+# -----------------------------
+@app.post("/emotion/batch")
+async def emotion_batch(request: EmotionBatchRequest):
+    """
+    Scores many messages in one vectorized pass (nightly mood analytics).
+    """
+    if len(request.texts) > MAX_EMOTION_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_EMOTION_BATCH} texts per batch.")
+
+    labels, polarities = await asyncio.to_thread(emotion_classifier.classify_batch, request.texts)
+    return {
+        "results": [
+            {"emotion": label, "polarity": polarity}
+            for label, polarity in zip(labels, polarities)
+        ]
+    }
+
+
 # -----------------------------
 # AUDIO CHAT ENDPOINT
 # -----------------------------
 @app.post("/chat/audio")
-async def chat_audio(file: UploadFile = File(...), user_id: str = Form("default_user")):
+async def chat_audio(
+    file: UploadFile = File(...),
+    user_id: str = Form("default_user"),
+    budget_ms: int | None = Form(None),
+    hedge_ms: int | None = Form(None)
+):
     try:
-        from voice_service import voice_service
-
-        # Save temp audio file
-        temp_filename = f"temp_{file.filename}"
-        with open(temp_filename, "wb") as buffer:
-            buffer.write(await file.read())
+        voice_service = require_voice()
 
-        # Speech to text
-        text = await voice_service.speech_to_text(temp_filename)
-
-        os.remove(temp_filename)
+        # Spool the upload (bounded, anonymous, always closed) and transcribe
+        with stage("upload_read"):
+            audio = await spool_upload(file)
+        with audio:
+            # Downmix/resample/trim before upload so STT gets a compact 16 kHz mono clip
+            with stage("audio_prep"):
+                payload, mimetype, prep = await asyncio.to_thread(prepare_audio, audio, file.content_type)
+            async with voice_scheduler.slot(user_id):
+                with stage("stt", upstream="deepgram"):
+                    text = await voice_service.speech_to_text(payload, mimetype=mimetype)
 
         # AI Response
-        ai_res = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are MagizhBuddy, a fun emotional companion."},
-                {"role": "user", "content": text}
-            ]
+        emotion, _ = emotion_classifier.classify(text)
+        budget, hedge_after = budget_seconds(budget_ms, hedge_ms)
+        reply, source = await complete(
+            user_id,
+            await off_loop(memory.build_messages, user_id, VOICE_SYSTEM_PROMPT, text),
+            text,
+            emotion,
+            budget,
+            hedge_after
         )
-
-        reply = ai_res.choices[0].message["content"]
+        await record_turn(user_id, text, reply, emotion, source)
 
         # Convert AI reply to audio
-        audio_path = await voice_service.text_to_speech(reply)
+        async with voice_scheduler.slot(user_id):
+            with stage("tts", upstream="deepgram"):
+                audio_path = await voice_service.text_to_speech(reply)
 
         return {
             "text": text,
             "response": reply,
-            "emotion": "happy",
-            "audio_url": f"/static/audio/{os.path.basename(audio_path)}"
+            "emotion": emotion,
+            "audio_url": f"/static/audio/{os.path.basename(audio_path)}",
+            "source": source,
+            "audio_prep": prep
         }
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         return {
             "response": "I am listening but my brain is not connected to drive. Check API key.",
@@ -115,5 +552,54 @@ async def chat_audio(file: UploadFile = File(...), user_id: str = Form("default_
         }
 
 
+# -----------------------------
+# PIPELINED VOICE ENDPOINT (WEBSOCKET)
+# -----------------------------
+@app.websocket("/ws/voice")
+async def voice_socket(websocket: WebSocket, user_id: str = "default_user"):
+    """
+    Streams 16 kHz mono linear16 PCM in; partial transcripts, reply tokens
+    and sentence-by-sentence TTS audio out. See VoiceTurnPipeline.
+    """
+    from voice_pipeline import VoiceTurnPipeline
+
+    await websocket.accept()
+
+    if voice_service is None or not voice_service.client or client is None:
+        await websocket.send_json({"type": "error", "error": "Voice backend is not available."})
+        await websocket.close()
+        return
+
+    pipeline = VoiceTurnPipeline(
+        websocket,
+        user_id,
+        deepgram=voice_service.client,
+        llm=client,
+        memory=memory,
+        history=history,
+        voice_service=voice_service,
+        model=MODEL,
+        system_prompt=VOICE_SYSTEM_PROMPT,
+        llm_scheduler=llm_scheduler,
+        voice_scheduler=voice_scheduler,
+    )
+    await pipeline.run()
+
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    parser = argparse.ArgumentParser(description="Run the MagizhBuddy API.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument("--reload", action="store_true", help="single process with auto-reload, for development")
+    args = parser.parse_args()
+
+    if args.reload:
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
+    else:
+        workers = args.workers or os.cpu_count() or 1
+        # Inherited by the worker processes, which pick shared state from it
+        os.environ["MAGIZH_WORKERS"] = str(workers)
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=workers,
+                    proxy_headers=True, log_level="info")
@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import OrderedDict, deque
+
+from shared_state import shared_store
+
+
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "8"))
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1200"))
+MEMORY_MAX_USERS = int(os.getenv("MEMORY_MAX_USERS", "10000"))
+MEMORY_MAX_TOTAL_TOKENS = int(os.getenv("MEMORY_MAX_TOTAL_TOKENS", "5000000"))
+MEMORY_SESSION_TTL = float(os.getenv("MEMORY_SESSION_TTL", str(7 * 24 * 3600)))
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token for English).
+    Good enough for budgeting without pulling in a tokenizer.
+    """
+    return max(1, (len(text) + 3) // 4)
+
+
+class ConversationMemory:
+    def __init__(self,
+                 max_turns=MEMORY_MAX_TURNS,
+                 max_tokens=MEMORY_MAX_TOKENS,
+                 max_users=MEMORY_MAX_USERS,
+                 max_total_tokens=MEMORY_MAX_TOTAL_TOKENS):
+        """
+        Per-user conversation memory.
+
+        - Each user keeps a ring of at most `max_turns` turns (user + assistant)
+          whose estimated size stays under `max_tokens`.
+        - Users are kept in LRU order; the least recently active users are
+          dropped once `max_users` or `max_total_tokens` is exceeded.
+        """
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_users = max_users
+        self.max_total_tokens = max_total_tokens
+
+        self._users = OrderedDict()   # user_id -> deque[(role, content, tokens)]
+        self._user_tokens = {}        # user_id -> tokens currently held
+        self._total_tokens = 0
+        self._lock = threading.Lock()
+
+    # -----------------------------------------------------------
+    # READ
+    # -----------------------------------------------------------
+    def history(self, user_id):
+        """Returns the stored turns for `user_id` as chat messages, oldest first."""
+        with self._lock:
+            ring = self._users.get(user_id)
+            if ring is None:
+                return []
+            self._users.move_to_end(user_id)
+            return [{"role": role, "content": content} for role, content, _ in ring]
+
+    def build_messages(self, user_id, system_prompt, text):
+        """System prompt + remembered context + the new user message."""
+        return (
+            [{"role": "system", "content": system_prompt}]
+            + self.history(user_id)
+            + [{"role": "user", "content": text}]
+        )
+
+    # -----------------------------------------------------------
+    # WRITE
+    # -----------------------------------------------------------
+    def add_turn(self, user_id, user_text, reply):
+        """Records one exchange and trims the user's ring to its budget."""
+        if not user_text or not reply:
+            return
+
+        with self._lock:
+            ring = self._users.get(user_id)
+            if ring is None:
+                ring = deque(maxlen=self.max_turns * 2)
+                self._users[user_id] = ring
+                self._user_tokens[user_id] = 0
+            self._users.move_to_end(user_id)
+
+            for role, content in (("user", user_text), ("assistant", reply)):
+                if len(ring) == ring.maxlen:
+                    self._drop_oldest(user_id, ring)
+                tokens = estimate_tokens(content)
+                ring.append((role, content, tokens))
+                self._user_tokens[user_id] += tokens
+                self._total_tokens += tokens
+
+            # Keep whole turns only: drop user/assistant pairs from the front
+            while self._user_tokens[user_id] > self.max_tokens and len(ring) > 2:
+                self._drop_oldest(user_id, ring)
+                if ring and ring[0][0] == "assistant":
+                    self._drop_oldest(user_id, ring)
+
+            self._evict()
+
+    def clear(self, user_id):
+        with self._lock:
+            self._forget(user_id)
+
+    # -----------------------------------------------------------
+    # INTERNALS (caller holds the lock)
+    # -----------------------------------------------------------
+    def _drop_oldest(self, user_id, ring):
+        _, _, tokens = ring.popleft()
+        self._user_tokens[user_id] -= tokens
+        self._total_tokens -= tokens
+
+    def _forget(self, user_id):
+        if self._users.pop(user_id, None) is not None:
+            self._total_tokens -= self._user_tokens.pop(user_id)
+
+    def _evict(self):
+        while self._users and (
+            len(self._users) > self.max_users
+            or self._total_tokens > self.max_total_tokens
+        ):
+            oldest_user = next(iter(self._users))
+            self._forget(oldest_user)
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._users), "tokens": self._total_tokens}
+
+
+class SharedConversationMemory(ConversationMemory):
+    def __init__(self, store=None, session_ttl=MEMORY_SESSION_TTL, namespace="session", evict_every=256,
+                 **limits):
+        """
+        ConversationMemory kept in the cross-process SharedStore, so a user's
+        turns are visible to whichever worker serves their next request.
+
+        Per-user limits (`max_turns`, `max_tokens`) are applied on every
+        write, atomically across processes; `max_users` is enforced every
+        `evict_every` writes and idle sessions expire after `session_ttl`.
+        `max_total_tokens` is not tracked here.
+        """
+        super().__init__(**limits)
+        self.store = store or shared_store
+        self.session_ttl = session_ttl
+        self.namespace = namespace
+        self.evict_every = evict_every
+        self._writes = 0
+
+    def history(self, user_id):
+        turns = self.store.get(self.namespace, user_id) or []
+        return [{"role": role, "content": content} for role, content, _ in turns]
+
+    def add_turn(self, user_id, user_text, reply):
+        if not user_text or not reply:
+            return
+
+        def append(turns):
+            turns = (turns or []) + [
+                ["user", user_text, estimate_tokens(user_text)],
+                ["assistant", reply, estimate_tokens(reply)],
+            ]
+            turns = turns[-self.max_turns * 2:]
+
+            # Keep whole turns only: drop user/assistant pairs from the front
+            while sum(t[2] for t in turns) > self.max_tokens and len(turns) > 2:
+                turns.pop(0)
+                if turns and turns[0][0] == "assistant":
+                    turns.pop(0)
+            return turns
+
+        self.store.update(self.namespace, user_id, append, self.session_ttl)
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.store.evict(self.namespace, self.max_users)
+
+    def clear(self, user_id):
+        self.store.delete(self.namespace, user_id)
+
+    def stats(self):
+        return {"users": self.store.count(self.namespace), "shared": True}
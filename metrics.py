@@ -0,0 +1,221 @@
+import time
+import uuid
+import asyncio
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+
+# Request id of the request being served; set by the middleware in main.py
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_trace_hooks = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self, const=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples(list(const)))
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, const):
+        return [f"{self.name}{_format_labels(self.labelnames, k, const)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self, const):
+        return [f"{self.name}{_format_labels(self.labelnames, k, const)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self, const):
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, const + [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, const + [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labelnames, key, const)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render(const_labels=None):
+    """
+    All metrics in the Prometheus text exposition format (0.0.4).
+    `const_labels` (e.g. {"worker": pid}) are added to every sample, so
+    scrapes of different worker processes stay distinguishable.
+    """
+    const = sorted((const_labels or {}).items())
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(const))
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------------------------------------
+# TRACING
+# -----------------------------------------------------------
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def add_trace_hook(hook):
+    """
+    Registers `hook(request_id, stage, seconds, error)`, called after every
+    timed stage. Use it to forward spans to a tracer or a log.
+    """
+    _trace_hooks.append(hook)
+
+
+def record(name, seconds, error=None):
+    """Records an already measured stage (for code that can't use `stage`)."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    for hook in _trace_hooks:
+        try:
+            hook(request_id_var.get(), name, seconds, error)
+        except Exception as e:
+            print(f"Trace hook error: {e}")
+
+
+@contextmanager
+def stage(name, upstream=None):
+    """
+    Times one stage of a request into STAGE_SECONDS, tagged with the
+    current request id for trace hooks. Exceptions raised inside count as
+    UPSTREAM_ERRORS for `upstream` (if given) and are re-raised. Cancelled
+    stages (e.g. the losing call of a hedged pair) are not recorded, so
+    they don't skew the latency distribution.
+    """
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except asyncio.CancelledError:
+        started = None
+        raise
+    except Exception as e:
+        error = e
+        if upstream:
+            UPSTREAM_ERRORS.inc(upstream=upstream, error=type(e).__name__)
+        raise
+    finally:
+        if started is not None:
+            record(name, time.perf_counter() - started, error)
+
+
+# -----------------------------------------------------------
+# METRICS
+# -----------------------------------------------------------
+STAGE_SECONDS = Histogram(
+    "magizh_stage_seconds",
+    "Time spent per request stage (upload_read, audio_prep, stt, llm_ttft, llm_total, tts, file_write).",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "magizh_request_seconds",
+    "End-to-end HTTP request latency.",
+    ["method", "path", "status"],
+)
+CACHE_LOOKUPS = Counter(
+    "magizh_cache_lookups_total",
+    "Cache lookups by cache and result.",
+    ["cache", "result"],
+)
+UPSTREAM_ERRORS = Counter(
+    "magizh_upstream_errors_total",
+    "Failed upstream calls by upstream and exception type.",
+    ["upstream", "error"],
+)
+AUDIO_PREP_BYTES = Counter(
+    "magizh_audio_prep_bytes_total",
+    "Uploaded audio bytes received (kind=original) and sent to STT after preprocessing (kind=sent).",
+    ["kind"],
+)
+SCHEDULER_IN_FLIGHT = Gauge(
+    "magizh_scheduler_in_flight",
+    "Upstream calls currently in flight.",
+    ["upstream"],
+)
+SCHEDULER_QUEUED = Gauge(
+    "magizh_scheduler_queued",
+    "Upstream calls waiting for admission.",
+    ["upstream"],
+)
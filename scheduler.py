@@ -0,0 +1,148 @@
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "32"))
+UPSTREAM_MAX_QUEUE = int(os.getenv("UPSTREAM_MAX_QUEUE", "256"))
+UPSTREAM_MAX_QUEUE_PER_USER = int(os.getenv("UPSTREAM_MAX_QUEUE_PER_USER", "4"))
+
+
+class Overloaded(HTTPException):
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class FairScheduler:
+    def __init__(self, name,
+                 max_concurrency=UPSTREAM_MAX_CONCURRENCY,
+                 max_queue=UPSTREAM_MAX_QUEUE,
+                 max_queue_per_user=UPSTREAM_MAX_QUEUE_PER_USER):
+        """
+        Admission control for one upstream (e.g. OpenAI or Deepgram).
+
+        - At most `max_concurrency` calls in flight.
+        - Waiting callers sit in per-user FIFO queues that are served
+          round-robin, so one chatty user can't starve everyone else.
+        - Fails fast instead of queueing forever: 429 when a user already has
+          `max_queue_per_user` calls waiting, 503 when `max_queue` is full.
+          Both carry a Retry-After estimated from recent service times.
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+
+        self._in_flight = 0
+        self._queued = 0
+        self._users = OrderedDict()   # user_id -> deque[Future], round-robin order
+        self._avg_service = 1.0       # EWMA of seconds per call
+
+        self.admitted = 0
+        self.rejected = 0
+
+    # -----------------------------------------------------------
+    # PUBLIC API
+    # -----------------------------------------------------------
+    @asynccontextmanager
+    async def slot(self, user_id):
+        started = await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    async def acquire(self, user_id):
+        """
+        Waits for a slot; returns a token to pass back to `release()`.
+        """
+        if self._in_flight < self.max_concurrency and not self._queued:
+            return self._admit()
+
+        queue = self._users.get(user_id)
+        if queue is not None and len(queue) >= self.max_queue_per_user:
+            self.rejected += 1
+            raise Overloaded(429, f"Too many pending {self.name} requests for this user.", self.retry_after())
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(503, f"{self.name} is busy, please retry shortly.", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._users[user_id] = deque()
+        queue.append(waiter)
+        self._queued += 1
+
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self.release(waiter.result())
+            else:
+                self._remove(user_id, waiter)
+            raise
+
+    def release(self, started):
+        self._in_flight -= 1
+        elapsed = time.monotonic() - started
+        self._avg_service += 0.1 * (elapsed - self._avg_service)
+        self._dispatch()
+
+    def retry_after(self):
+        backlog = self._queued + self._in_flight
+        return max(1, math.ceil(backlog * self._avg_service / self.max_concurrency))
+
+    def stats(self):
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "users_waiting": len(self._users),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_service_s": round(self._avg_service, 3),
+        }
+
+    # -----------------------------------------------------------
+    # INTERNALS
+    # -----------------------------------------------------------
+    def _admit(self):
+        self._in_flight += 1
+        self.admitted += 1
+        return time.monotonic()
+
+    def _dispatch(self):
+        while self._in_flight < self.max_concurrency and self._users:
+            user_id, queue = next(iter(self._users.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+
+            # Rotate: this user goes to the back of the round-robin
+            if queue:
+                self._users.move_to_end(user_id)
+            else:
+                del self._users[user_id]
+
+            if not waiter.done():
+                waiter.set_result(self._admit())
+
+    def _remove(self, user_id, waiter):
+        queue = self._users.get(user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+            self._queued -= 1
+        except ValueError:
+            return
+        if not queue:
+            del self._users[user_id]
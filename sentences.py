@@ -0,0 +1,27 @@
+import re
+
+
+# A sentence ends at . ! ? (or the Tamil/Devanagari danda) followed by space
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+MIN_SENTENCE_CHARS = 12
+
+
+def split_sentences(buffer):
+    """
+    Splits off complete sentences from a growing token buffer.
+    Returns (sentences, remainder). Very short fragments are merged into the
+    next sentence so TTS isn't called for "Oh." on its own.
+    """
+    parts = _SENTENCE_END.split(buffer)
+    remainder = parts.pop()
+
+    sentences, pending = [], ""
+    for part in parts:
+        pending = f"{pending} {part}".strip()
+        if len(pending) >= MIN_SENTENCE_CHARS:
+            sentences.append(pending)
+            pending = ""
+
+    if pending:
+        remainder = f"{pending} {remainder}".strip()
+    return sentences, remainder
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+# Set by `python main.py` for its worker processes (see main.py)
+WORKERS = int(os.getenv("MAGIZH_WORKERS", "1"))
+# "auto": shared when running more than one worker; "sqlite" or "memory" to force
+SHARED_STATE = os.getenv("SHARED_STATE", "auto")
+SHARED_STATE_DB = os.getenv("SHARED_STATE_DB", os.path.join("data", "shared_state.db"))
+SHARED_BUSY_TIMEOUT_MS = int(os.getenv("SHARED_BUSY_TIMEOUT_MS", "2000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    expires_at  REAL NOT NULL,
+    touched_at  REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_kv_touched ON kv (namespace, touched_at);
+"""
+
+
+def enabled():
+    """True when state must be shared between worker processes."""
+    if SHARED_STATE == "auto":
+        return WORKERS > 1
+    return SHARED_STATE == "sqlite"
+
+
+class SharedStore:
+    def __init__(self, path=SHARED_STATE_DB):
+        """
+        Namespaced key/value store with TTLs in one SQLite file (WAL mode),
+        readable and writable by every worker process on the host.
+
+        Each process (and a forked child) opens its own connection lazily;
+        values are JSON. Readers never block writers under WAL.
+        """
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={SHARED_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, namespace, key):
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, now),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, namespace, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at, touched_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now + ttl, now),
+            )
+
+    def update(self, namespace, key, fn, ttl):
+        """
+        Atomically replaces the value with `fn(old_value_or_None)` across
+        processes (the write lock is taken before the read).
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (namespace, key, now),
+                ).fetchone()
+                value = fn(None if row is None else json.loads(row[0]))
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at, touched_at) VALUES (?, ?, ?, ?, ?)",
+                    (namespace, key, json.dumps(value), now + ttl, now),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def delete(self, namespace, key=None):
+        with self._lock:
+            if key is None:
+                self._connect().execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+            else:
+                self._connect().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def count(self, namespace):
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM kv WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+
+    def evict(self, namespace, max_entries):
+        """
+        Drops expired entries, then the least recently written ones beyond
+        `max_entries`. Returns the number of rows removed.
+        """
+        with self._lock:
+            conn = self._connect()
+            removed = conn.execute(
+                "DELETE FROM kv WHERE namespace = ? AND expires_at <= ?", (namespace, time.time())
+            ).rowcount
+            excess = conn.execute(
+                "SELECT COUNT(*) FROM kv WHERE namespace = ?", (namespace,)
+            ).fetchone()[0] - max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM kv WHERE namespace = ? AND key IN "
+                    "(SELECT key FROM kv WHERE namespace = ? ORDER BY touched_at LIMIT ?)",
+                    (namespace, namespace, excess),
+                ).rowcount
+        return removed
+
+
+shared_store = SharedStore()
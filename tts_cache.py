@@ -0,0 +1,176 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+
+from metrics import CACHE_LOOKUPS, stage
+
+
+AUDIO_DIR = os.path.join("static", "audio")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+TTS_CACHE_JANITOR_INTERVAL = float(os.getenv("TTS_CACHE_JANITOR_INTERVAL", "60"))
+
+
+def tts_key(text, voice):
+    return hashlib.sha256(f"{voice}\x1f{text.strip()}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, directory=AUDIO_DIR, max_bytes=TTS_CACHE_MAX_BYTES, extension="mp3"):
+        """
+        Content-addressed cache of synthesized speech.
+
+        - Files are named sha256(voice, text).<ext>, so an utterance is
+          synthesized once and then served straight from the /static mount.
+        - Concurrent misses for the same utterance share one synthesis call.
+        - mtime doubles as "last used"; the janitor evicts the oldest files
+          once the directory exceeds `max_bytes`.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._inflight = {}     # path -> synthesis task
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, text, voice):
+        return os.path.join(self.directory, f"{tts_key(text, voice)}.{self.extension}")
+
+    # -----------------------------------------------------------
+    # LOOKUP / FILL
+    # -----------------------------------------------------------
+    async def get_path(self, text, voice, synthesize):
+        """
+        Returns the cached file path for (text, voice), calling
+        `await synthesize(text, voice)` -> bytes only on a miss.
+        """
+        path = self.lookup(text, voice)
+        if path:
+            return path
+        path = self.path_for(text, voice)
+
+        inflight = self._inflight.get(path)
+        if inflight:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="tts", result="hit")
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache="tts", result="miss")
+        # The synthesis runs in a task owned by the cache, not by this caller:
+        # a caller that gets cancelled stops waiting, but the others still
+        # get the file (and it still lands in the cache).
+        task = asyncio.create_task(self._fill(path, text, voice, synthesize))
+        self._inflight[path] = task
+        task.add_done_callback(lambda done: self._settle(path, done))
+        return await asyncio.shield(task)
+
+    async def _fill(self, path, text, voice, synthesize):
+        audio = await synthesize(text, voice)
+        await asyncio.to_thread(self._write, path, audio)
+        return path
+
+    def _settle(self, path, task):
+        if self._inflight.get(path) is task:
+            del self._inflight[path]
+        # Every waiter may be gone; don't leave "exception never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def lookup(self, text, voice):
+        """Returns the cached path (marking it recently used), or None."""
+        path = self.path_for(text, voice)
+        if self._touch(path):
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="tts", result="hit")
+            return path
+        return None
+
+    async def store(self, text, voice, audio):
+        """Adds already synthesized audio (e.g. collected from a stream)."""
+        path = self.path_for(text, voice)
+        await asyncio.to_thread(self._write, path, audio)
+        return path
+
+    async def get_bytes(self, text, voice, synthesize):
+        path = await self.get_path(text, voice, synthesize)
+        return await asyncio.to_thread(self._read, path)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _write(self, path, data):
+        # Write-then-rename so readers never see a half-written file
+        with stage("file_write"):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    # -----------------------------------------------------------
+    # 🧹 JANITOR
+    # -----------------------------------------------------------
+    def enforce_quota(self):
+        """
+        Deletes least recently used files until the directory fits the quota.
+        Returns the number of bytes freed.
+        """
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.is_file()]
+        except FileNotFoundError:
+            return 0
+
+        files = []
+        total = 0
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            # Stale temp files from crashed writes are always fair game
+            if entry.name.endswith(".tmp") and stat.st_mtime < time.time() - 300:
+                files.append((0, stat.st_size, entry.path))
+            else:
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        freed = 0
+        files.sort()
+        for _, size, path in files:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                freed += size
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+        return freed
+
+    async def run_janitor(self, interval=TTS_CACHE_JANITOR_INTERVAL):
+        while True:
+            try:
+                freed = await asyncio.to_thread(self.enforce_quota)
+                if freed:
+                    print(f"[TTS CACHE] Evicted {freed} bytes.")
+            except Exception as e:
+                print(f"TTS cache janitor error: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+tts_cache = TTSCache()
@@ -5,8 +5,15 @@
 # If you have separate asset images, put them in an "assets/" folder and update the paths below.
 
 import os
+import time
+import asyncio
 import flet as ft
 
+from chat_view import ChatView
+from image_cache import image_cache
+from sentences import split_sentences
+from worker import BackgroundWorker
+
 # --- Optional integration placeholders (so this UI runs even if Brain/AudioEngine don't exist) ---
 try:
     from brain import Brain
@@ -21,9 +28,11 @@ except Exception:
             return 0.0, ft.colors.BLUE_200
         async def get_response(self, text, polarity=0.0):
             return "I hear you. It's okay to feel like that."
+        async def stream_response(self, text):
+            yield await self.get_response(text)
 
 try:
-    from audio_engine import AudioEngine
+    from Audio import AudioEngine
 except Exception:
     class AudioEngine:
         def __init__(self):
@@ -32,10 +41,19 @@ except Exception:
             return "placeholder transcribed text"
         async def speak(self, text, voice=None, pitch=None, rate=None):
             return None
+        async def play_stream(self, text, voice=None):
+            return None
+        async def record_and_transcribe_live(self, callback, duration=15):
+            return ""
+        def stop_recording(self):
+            pass
+
+# Reply text is repainted at most once per frame, however fast tokens arrive
+FRAME_SECONDS = 1 / 60
 
 ASSET_IMAGE = "/mnt/data/ChatGPT Image Dec 5, 2025, 01_15_39 PM.png"
 if not os.path.exists(ASSET_IMAGE):
-    # fallback to built-in placeholder if the path isn't available
+    # image_cache shows a local icon placeholder instead (no network needed)
     ASSET_IMAGE = None
 
 # --- App UI ---
@@ -64,7 +82,52 @@ def main(page: ft.Page):
     current_language = "English"
 
     brain = Brain(api_key=os.getenv("GEMINI_API_KEY", None))
-    audio_engine = AudioEngine()
+    audio_engine = None
+
+    def get_audio_engine():
+        # Deepgram client + TTS cache scan are built on first use, after the first paint
+        nonlocal audio_engine
+        if audio_engine is None:
+            audio_engine = AudioEngine()
+        return audio_engine
+
+    # Network, STT and playback run here; handlers only schedule jobs
+    worker = BackgroundWorker()
+    page.on_disconnect = lambda e: worker.stop()
+
+    async def speak_sentences(sentences):
+        while (sentence := await sentences.get()) is not None:
+            await get_audio_engine().play_stream(sentence)
+
+    async def stream_reply(text, show):
+        """
+        Streams Buddy's reply to `text` into `show(reply_so_far)` and speaks
+        it sentence by sentence while the rest is still arriving.
+        """
+        sentences = asyncio.Queue()
+        speaker = asyncio.create_task(speak_sentences(sentences))
+        reply, buffer, painted_at = "", "", 0.0
+        try:
+            async for token in brain.stream_response(text):
+                reply += token
+                buffer += token
+                ready, buffer = split_sentences(buffer)
+                for sentence in ready:
+                    sentences.put_nowait(sentence)
+
+                now = time.monotonic()
+                if now - painted_at >= FRAME_SECONDS:
+                    show(reply)
+                    painted_at = now
+
+            show(reply)
+            if buffer.strip():
+                sentences.put_nowait(buffer.strip())
+            sentences.put_nowait(None)
+            await speaker
+        finally:
+            speaker.cancel()
+        return reply
 
     # --- Reusable styles & helpers ---
     CARD_RADIUS = 26
@@ -81,160 +144,227 @@ def main(page: ft.Page):
         )
 
     # --- Screens (6 screens to reflect your mockup) ---
-    screens = [None]*6
+    # Each screen is built on first navigation and reused afterwards
     # Screen 0: Welcome
-    welcome_stack = ft.Column(
-        [
-            ft.Container(height=18),
-            ft.Text("welcome to", size=20, weight=ft.FontWeight.MEDIUM, color="#264653"),
-            ft.Text("MagizhBuddy", size=34, weight=ft.FontWeight.BOLD, color="#1b4965"),
-            ft.Container(height=18),
-            # Hero image (use provided mockup image as a placeholder)
-            ft.Container(
-                content=ft.Image(src=ASSET_IMAGE or "https://picsum.photos/400/400", fit=ft.ImageFit.CONTAIN),
-                width=320,
-                height=320,
-                border_radius=ft.border_radius.all(180),
-                clip_behavior=ft.ClipBehavior.HARD_EDGE,
-                bgcolor="#FFFFFF"
-            ),
-            ft.Container(height=24),
-            ft.Text(
-                "A friendly companion to listen and bring a little cheer. Tap Buddy to begin.",
-                size=14, text_align=ft.TextAlign.CENTER, color="#2E3A59"
-            )
-        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER
-    )
-    screens[0] = rounded_card(welcome_stack, width=380, bgcolor="#EAF6FF")
+    def build_welcome():
+        welcome_stack = ft.Column(
+            [
+                ft.Container(height=18),
+                ft.Text("welcome to", size=20, weight=ft.FontWeight.MEDIUM, color="#264653"),
+                ft.Text("MagizhBuddy", size=34, weight=ft.FontWeight.BOLD, color="#1b4965"),
+                ft.Container(height=18),
+                # Hero image (use provided mockup image as a placeholder)
+                ft.Container(
+                    content=image_cache.image(ASSET_IMAGE, 320, 320),
+                    width=320,
+                    height=320,
+                    alignment=ft.alignment.center,
+                    border_radius=ft.border_radius.all(180),
+                    clip_behavior=ft.ClipBehavior.HARD_EDGE,
+                    bgcolor="#FFFFFF"
+                ),
+                ft.Container(height=24),
+                ft.Text(
+                    "A friendly companion to listen and bring a little cheer. Tap Buddy to begin.",
+                    size=14, text_align=ft.TextAlign.CENTER, color="#2E3A59"
+                )
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER
+        )
+        return rounded_card(welcome_stack, width=380, bgcolor="#EAF6FF")
 
     # Screen 1: Chat input (bear + input box)
-    chat_messages = ft.Column(scroll=ft.ScrollMode.AUTO, spacing=12, width=360, height=360)
-    chat_input = ft.TextField(
-        hint_text="Type a message",
-        expand=True,
-        suffix=ft.IconButton(icon=ft.icons.MIC, on_click=lambda e: page.snack_bar.open_dialog("Mic pressed")),
-        border_radius=20
-    )
+    def build_buddy():
+        # Lazily rendered, capped transcript (see chat_view.py)
+        chat_view = ChatView(width=360, height=360)
+        chat_input = ft.TextField(
+            hint_text="Type a message",
+            expand=True,
+            suffix=ft.IconButton(icon=ft.icons.MIC, on_click=lambda e: page.snack_bar.open_dialog("Mic pressed")),
+            border_radius=20
+        )
 
-    def send_chat_msg(e):
-        if chat_input.value:
-            chat_messages.controls.append(
-                ft.Row([ft.Container(content=ft.Text(chat_input.value), padding=10, border_radius=12, bgcolor="#DFF3FF")],
-                       alignment=ft.MainAxisAlignment.END)
-            )
+        def send_chat_msg(e):
+            text = (chat_input.value or "").strip()
+            if not text:
+                return
+
+            # Show the message right away; the reply fills in its own bubble
+            chat_view.add("user", text)
             chat_input.value = ""
-            page.update()
+            chat_input.update()
+            reply_bubble = chat_view.add("buddy", "…")
 
-    send_btn = ft.FilledButton("Send", on_click=send_chat_msg)
-    chat_column = ft.Column(
-        [
-            ft.Container(
-                content=ft.Image(src=ASSET_IMAGE or "https://picsum.photos/200/200", fit=ft.ImageFit.CONTAIN),
-                width=160, height=160, border_radius=ft.border_radius.all(90), bgcolor="#FFFFFF"
-            ),
-            ft.Container(height=6),
-            ft.Text("Hi, I feel sad", size=18, color="#143A52", weight=ft.FontWeight.MEDIUM),
-            ft.Container(height=12),
-            chat_messages,
-            ft.Row([chat_input, send_btn], spacing=8)
-        ],
-        horizontal_alignment=ft.CrossAxisAlignment.CENTER
-    )
-    screens[1] = rounded_card(chat_column, width=380, bgcolor="#E6F3FF")
+            # A new message cancels the reply (and speech) still in progress
+            worker.submit(stream_reply(text, lambda reply: chat_view.set_text(reply_bubble, reply)), key="chat")
+
+        chat_input.on_submit = send_chat_msg
+        send_btn = ft.FilledButton("Send", on_click=send_chat_msg)
+        chat_column = ft.Column(
+            [
+                ft.Container(
+                    content=image_cache.image(ASSET_IMAGE, 160, 160), alignment=ft.alignment.center,
+                    width=160, height=160, border_radius=ft.border_radius.all(90), bgcolor="#FFFFFF"
+                ),
+                ft.Container(height=6),
+                ft.Text("Hi, I feel sad", size=18, color="#143A52", weight=ft.FontWeight.MEDIUM),
+                ft.Container(height=12),
+                chat_view.control,
+                ft.Row([chat_input, send_btn], spacing=8)
+            ],
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER
+        )
+        return rounded_card(chat_column, width=380, bgcolor="#E6F3FF")
 
     # Screen 2: Mood check-in (emoji buttons)
-    def on_mood_click(e, mood):
-        page.snack_bar = ft.SnackBar(ft.Text(f"Thanks for sharing — you selected: {mood}"))
-        page.snack_bar.open = True
-        page.update()
+    def build_mood():
+        def on_mood_click(e, mood):
+            page.snack_bar = ft.SnackBar(ft.Text(f"Thanks for sharing — you selected: {mood}"))
+            page.snack_bar.open = True
+            page.update()
 
-    mood_row = ft.Row([
-        ft.Container(ft.Text("😟", size=28), width=68, height=68, alignment=ft.alignment.center,
-                     border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Sad")),
-        ft.Container(ft.Text("🙂", size=28), width=68, height=68, alignment=ft.alignment.center,
-                     border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Okay")),
-        ft.Container(ft.Text("😊", size=28), width=68, height=68, alignment=ft.alignment.center,
-                     border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Happy")),
-        ft.Container(ft.Text("😁", size=28), width=68, height=68, alignment=ft.alignment.center,
-                     border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Excited")),
-    ], alignment=ft.MainAxisAlignment.SPACE_AROUND)
-
-    mood_col = ft.Column([
-        ft.Text("How are you feeling today", size=20, weight=ft.FontWeight.BOLD, color="#16425B"),
-        ft.Container(height=16),
-        mood_row,
-        ft.Container(height=18),
-        ft.Container(
-            content=ft.Image(src=ASSET_IMAGE or "https://picsum.photos/160/160", fit=ft.ImageFit.CONTAIN),
-            width=140, height=140, border_radius=ft.border_radius.all(80), bgcolor="#FFFFFF"
-        )
-    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
-    screens[2] = rounded_card(mood_col, width=380, bgcolor="#EAF8FF")
+        mood_row = ft.Row([
+            ft.Container(ft.Text("😟", size=28), width=68, height=68, alignment=ft.alignment.center,
+                         border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Sad")),
+            ft.Container(ft.Text("🙂", size=28), width=68, height=68, alignment=ft.alignment.center,
+                         border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Okay")),
+            ft.Container(ft.Text("😊", size=28), width=68, height=68, alignment=ft.alignment.center,
+                         border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Happy")),
+            ft.Container(ft.Text("😁", size=28), width=68, height=68, alignment=ft.alignment.center,
+                         border_radius=ft.border_radius.all(34), bgcolor="#FFFFFF", on_click=lambda e: on_mood_click(e, "Excited")),
+        ], alignment=ft.MainAxisAlignment.SPACE_AROUND)
+
+        mood_col = ft.Column([
+            ft.Text("How are you feeling today", size=20, weight=ft.FontWeight.BOLD, color="#16425B"),
+            ft.Container(height=16),
+            mood_row,
+            ft.Container(height=18),
+            ft.Container(
+                content=image_cache.image(ASSET_IMAGE, 140, 140), alignment=ft.alignment.center,
+                width=140, height=140, border_radius=ft.border_radius.all(80), bgcolor="#FFFFFF"
+            )
+        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+        return rounded_card(mood_col, width=380, bgcolor="#EAF8FF")
 
     # Screen 3: Voice / Speak screen
-    def on_speak(e):
-        page.snack_bar = ft.SnackBar(ft.Text("Speak recording started (demo)"))
-        page.snack_bar.open = True
-        page.update()
+    def build_speak():
+        speak_status = ft.Text("Tap to speak and I'll listen. I won't store your voice.", size=14,
+                               text_align=ft.TextAlign.CENTER, color="#2E3A59")
+        speak_heard = ft.Text("", size=16, weight=ft.FontWeight.MEDIUM, color="#143A52", text_align=ft.TextAlign.CENTER)
+        speak_reply = ft.Text("", size=14, color="#2E3A59", text_align=ft.TextAlign.CENTER)
 
-    speak_col = ft.Column([
-        ft.Text("Speak", size=24, weight=ft.FontWeight.BOLD, color="#16324A"),
-        ft.Container(height=10),
-        ft.Container(
-            content=ft.Icon(ft.icons.MIC, size=48, color="#FFFFFF"),
-            width=120, height=120, border_radius=ft.border_radius.all(60), bgcolor="#1CA3D8", alignment=ft.alignment.center,
-            on_click=on_speak
-        ),
-        ft.Container(height=18),
-        ft.Text("Tap to speak and I'll listen. I won't store your voice.", size=14, text_align=ft.TextAlign.CENTER, color="#2E3A59")
-    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
-    screens[3] = rounded_card(speak_col, width=380, bgcolor="#DFF8FF")
+        def set_text(control, value):
+            control.value = value
+            if control.page is not None:
+                control.update()
+
+        async def listen_and_reply():
+            try:
+                set_text(speak_status, "Listening…")
+                set_text(speak_reply, "")
+
+                finals = []
+
+                async def on_transcript(transcript, final):
+                    # Interim results replace each other; finals accumulate
+                    if final:
+                        finals.append(transcript)
+                        set_text(speak_heard, " ".join(finals))
+                    else:
+                        set_text(speak_heard, " ".join(finals + [transcript]))
+
+                text = await get_audio_engine().record_and_transcribe_live(on_transcript)
+                if not text:
+                    set_text(speak_status, "I didn't catch that. Tap to try again.")
+                    return
+
+                set_text(speak_heard, text)
+                set_text(speak_status, "")
+                await stream_reply(text, lambda reply: set_text(speak_reply, reply))
+                set_text(speak_status, "Tap to speak again.")
+
+            except asyncio.CancelledError:
+                set_text(speak_status, "Stopped. Tap to speak again.")
+                raise
+
+        def on_speak(e):
+            # Second tap stops listening (or the reply being spoken)
+            if worker.cancel("speak"):
+                get_audio_engine().stop_recording()
+                return
+            worker.submit(listen_and_reply(), key="speak")
+
+        speak_col = ft.Column([
+            ft.Text("Speak", size=24, weight=ft.FontWeight.BOLD, color="#16324A"),
+            ft.Container(height=10),
+            ft.Container(
+                content=ft.Icon(ft.icons.MIC, size=48, color="#FFFFFF"),
+                width=120, height=120, border_radius=ft.border_radius.all(60), bgcolor="#1CA3D8", alignment=ft.alignment.center,
+                on_click=on_speak
+            ),
+            ft.Container(height=18),
+            speak_status,
+            ft.Container(height=10),
+            speak_heard,
+            ft.Container(height=6),
+            speak_reply
+        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+        return rounded_card(speak_col, width=380, bgcolor="#DFF8FF")
 
     # Screen 4: Chat response / encouragement
-    response_bubble = ft.Container(
-        content=ft.Text("Oh no, that's rough!\nJust remember, when life gives you lemons, you might be dyslexic.",
-                        size=14),
-        padding=16, border_radius=ft.border_radius.only(20,20,0,20), bgcolor="#FFFFFF", width=320
-    )
-    resp_col = ft.Column([
-        ft.Container(
-            content=ft.Image(src=ASSET_IMAGE or "https://picsum.photos/200/200", fit=ft.ImageFit.CONTAIN),
-            width=160, height=160, border_radius=ft.border_radius.all(90), bgcolor="#FFFFFF"
-        ),
-        ft.Container(height=10),
-        ft.Text("I had a tough day", size=18, weight=ft.FontWeight.MEDIUM, color="#143A52"),
-        ft.Container(height=10),
-        response_bubble
-    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
-    screens[4] = rounded_card(resp_col, width=380, bgcolor="#EAF1FF")
+    def build_response():
+        response_bubble = ft.Container(
+            content=ft.Text("Oh no, that's rough!\nJust remember, when life gives you lemons, you might be dyslexic.",
+                            size=14),
+            padding=16, border_radius=ft.border_radius.only(20,20,0,20), bgcolor="#FFFFFF", width=320
+        )
+        resp_col = ft.Column([
+            ft.Container(
+                content=image_cache.image(ASSET_IMAGE, 160, 160), alignment=ft.alignment.center,
+                width=160, height=160, border_radius=ft.border_radius.all(90), bgcolor="#FFFFFF"
+            ),
+            ft.Container(height=10),
+            ft.Text("I had a tough day", size=18, weight=ft.FontWeight.MEDIUM, color="#143A52"),
+            ft.Container(height=10),
+            response_bubble
+        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+        return rounded_card(resp_col, width=380, bgcolor="#EAF1FF")
 
     # Screen 5: Settings
-    def nav_item(title, icon):
-        return ft.Container(
-            content=ft.Row([
-                ft.Icon(icon, size=20),
-                ft.Container(width=12),
-                ft.Text(title, size=16)
-            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-            padding=12,
-            border_radius=ft.border_radius.all(14),
-            bgcolor="#FFFFFF"
-        )
-    settings_col = ft.Column([
-        ft.Text("Settings", size=24, weight=ft.FontWeight.BOLD, color="#16324A"),
-        ft.Container(height=18),
-        nav_item("Profile", ft.icons.PERSON),
-        ft.Container(height=10),
-        nav_item("Chat", ft.icons.CHAT_BUBBLE),
-        ft.Container(height=10),
-        nav_item("Notifications", ft.icons.NOTIFICATIONS),
-        ft.Container(height=10),
-        nav_item("About", ft.icons.INFO)
-    ], horizontal_alignment=ft.CrossAxisAlignment.START)
-    screens[5] = rounded_card(settings_col, width=380, bgcolor="#EAF9FF")
+    def build_settings():
+        def nav_item(title, icon):
+            return ft.Container(
+                content=ft.Row([
+                    ft.Icon(icon, size=20),
+                    ft.Container(width=12),
+                    ft.Text(title, size=16)
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                padding=12,
+                border_radius=ft.border_radius.all(14),
+                bgcolor="#FFFFFF"
+            )
+        settings_col = ft.Column([
+            ft.Text("Settings", size=24, weight=ft.FontWeight.BOLD, color="#16324A"),
+            ft.Container(height=18),
+            nav_item("Profile", ft.icons.PERSON),
+            ft.Container(height=10),
+            nav_item("Chat", ft.icons.CHAT_BUBBLE),
+            ft.Container(height=10),
+            nav_item("Notifications", ft.icons.NOTIFICATIONS),
+            ft.Container(height=10),
+            nav_item("About", ft.icons.INFO)
+        ], horizontal_alignment=ft.CrossAxisAlignment.START)
+        return rounded_card(settings_col, width=380, bgcolor="#EAF9FF")
+
+    screen_builders = [build_welcome, build_buddy, build_mood, build_speak, build_response, build_settings]
+    screens = [None] * len(screen_builders)
+
+    def get_screen(idx):
+        if screens[idx] is None:
+            screens[idx] = screen_builders[idx]()
+        return screens[idx]
 
     # Container that will hold the currently visible screen
-    screen_container = ft.Container(content=screens[0], alignment=ft.alignment.center)
+    screen_container = ft.Container(content=get_screen(0), alignment=ft.alignment.center)
 
     # Top segmented navigation (6 items to match mockup's 6 screens)
     nav_buttons = []
@@ -242,10 +372,9 @@ def main(page: ft.Page):
     nav_icons = [ft.icons.HOME, ft.icons.CHAT_BUBBLE, ft.icons.SENTIMENT_SATISFIED, ft.icons.MIC, ft.icons.REPLY, ft.icons.SETTINGS]
 
     def on_nav_click(e, idx):
-        screen_container.content = screens[idx]
-        # small animate: reassign the container to trigger UI update
+        screen_container.content = get_screen(idx)
+        # only the card area changes; the nav and background are left alone
         screen_container.update()
-        page.update()
 
     nav_row = ft.Row(spacing=8, alignment=ft.MainAxisAlignment.SPACE_AROUND)
     for i, (label, icon) in enumerate(zip(nav_labels, nav_icons)):
@@ -0,0 +1,115 @@
+import os
+import json
+import tempfile
+
+from fastapi import HTTPException
+
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(2 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Multipart boundaries and small form fields on top of the file itself
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+async def spool_upload(file, max_bytes=MAX_UPLOAD_BYTES, spool_bytes=UPLOAD_SPOOL_BYTES):
+    """
+    Copies an UploadFile into an anonymous spooled buffer, chunk by chunk.
+
+    - Stays in memory up to `spool_bytes`, then rolls over to an unnamed
+      temp file (no shared names, removed by the OS as soon as it is closed).
+    - Aborts with 413 once `max_bytes` is exceeded, without reading the rest.
+
+    The caller owns the returned buffer and should use it as a context manager.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    size = 0
+
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Audio upload exceeds {max_bytes} bytes."
+                )
+            buffer.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty audio upload.")
+
+    except BaseException:
+        buffer.close()
+        raise
+
+    buffer.seek(0)
+    return buffer
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app, paths, max_bytes=MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD):
+        """
+        Caps request bodies on `paths` before Starlette parses the multipart
+        form (which spools the whole body to its own temp file first).
+
+        A declared Content-Length over the cap is refused up front; chunked
+        bodies are counted as they arrive and cut off with 413 once over.
+        """
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            return await self._reject(send)
+
+        received = 0
+        overflowed = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, overflowed
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    overflowed = True
+                    raise RequestTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Whatever the app makes of the aborted body (FastAPI turns it
+            # into a 400) is replaced by the 413 below
+            nonlocal started
+            if not overflowed:
+                started = True
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except RequestTooLarge:
+            pass
+        if overflowed and not started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body exceeds {self.max_bytes} bytes."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,238 @@
+import json
+import asyncio
+from contextlib import nullcontext
+
+from deepgram import LiveTranscriptionEvents
+from fastapi import WebSocketDisconnect
+
+from sentences import split_sentences
+from scheduler import Overloaded
+
+
+# Same format AudioEngine._record_audio_thread produces
+LIVE_OPTIONS = {
+    "model": "nova-2-general",
+    "language": "en-IN",
+    "smart_format": True,
+    "encoding": "linear16",
+    "sample_rate": 16000,
+    "channels": 1,
+    "interim_results": True,
+    "endpointing": 300,
+}
+
+
+class VoiceTurnPipeline:
+    def __init__(self, websocket, user_id, deepgram, llm, memory, voice_service,
+                 model, system_prompt, voice="aura-asteria-en", history=None,
+                 llm_scheduler=None, voice_scheduler=None):
+        """
+        One WebSocket voice session with overlapped stages:
+
+        mic PCM frames ─▶ Deepgram live STT ─▶ partial/final transcripts
+                                   │ (speech_final)
+                                   ▼
+                        LLM token stream ─▶ sentence splitter ─▶ TTS per sentence
+                                   │                                   │
+                                   └──── tokens to client    audio to client (in order)
+
+        Protocol (server → client):
+          {"type": "partial" | "transcript", "text": ...}
+          {"type": "token", "text": ...}
+          {"type": "audio", "seq": n, "text": ...} followed by one binary frame
+          {"type": "done", "response": ...} / {"type": "error", "error": ...}
+
+        The LLM stream and each sentence's TTS take a slot from
+        `llm_scheduler` / `voice_scheduler` like the HTTP endpoints do; a
+        refused slot ends the turn with an error frame carrying `retry_after`.
+
+        Client → server: binary PCM frames, or {"type": "stop"} to end.
+        """
+        self.websocket = websocket
+        self.user_id = user_id
+        self.deepgram = deepgram
+        self.llm = llm
+        self.memory = memory
+        self.history = history
+        self.voice_service = voice_service
+        self.model = model
+        self.system_prompt = system_prompt
+        self.voice = voice
+        self.llm_scheduler = llm_scheduler
+        self.voice_scheduler = voice_scheduler
+
+        self._final_parts = []
+        self._turn_task = None
+        self._send_lock = asyncio.Lock()
+
+    # -----------------------------------------------------------
+    # SESSION
+    # -----------------------------------------------------------
+    async def run(self):
+        connection = self.deepgram.listen.asynclive.v("1")
+        connection.on(LiveTranscriptionEvents.Transcript, self._on_transcript)
+
+        if not await connection.start(LIVE_OPTIONS):
+            await self._send_json({"type": "error", "error": "Could not open Deepgram live session."})
+            return
+
+        disconnected = True
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+
+                if message.get("bytes"):
+                    await connection.send(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        control = json.loads(message["text"])
+                    except ValueError:
+                        await self._send_json({"type": "error", "error": "Control frames must be JSON."})
+                        continue
+                    if isinstance(control, dict) and control.get("type") == "stop":
+                        disconnected = False
+                        break
+
+        except WebSocketDisconnect:
+            pass
+
+        finally:
+            await connection.finish()
+            if self._turn_task:
+                # After "stop" the reply in flight still finishes; nobody is
+                # left to hear it after a disconnect, so drop it there
+                if disconnected:
+                    self._turn_task.cancel()
+                try:
+                    await self._turn_task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _on_transcript(self, connection, result, **kwargs):
+        try:
+            transcript = result.channel.alternatives[0].transcript
+        except Exception:
+            return
+
+        if not transcript:
+            return
+
+        if not result.is_final:
+            await self._send_json({"type": "partial", "text": transcript})
+            return
+
+        self._final_parts.append(transcript)
+        if not result.speech_final:
+            return
+
+        text = " ".join(self._final_parts)
+        self._final_parts = []
+        await self._send_json({"type": "transcript", "text": text})
+
+        # Barge-in: the user spoke again, drop the reply still in flight
+        if self._turn_task and not self._turn_task.done():
+            self._turn_task.cancel()
+        self._turn_task = asyncio.create_task(self._reply(text))
+
+    # -----------------------------------------------------------
+    # TURN: LLM STREAM + SENTENCE-LEVEL TTS
+    # -----------------------------------------------------------
+    async def _reply(self, text):
+        tts_queue = asyncio.Queue()
+        sender = asyncio.create_task(self._send_audio_in_order(tts_queue))
+        tokens, buffer, seq = [], "", 0
+
+        try:
+            # Memory may be the shared SQLite store; keep it off the event loop
+            messages = await asyncio.to_thread(self.memory.build_messages, self.user_id, self.system_prompt, text)
+
+            # The LLM slot is held for the whole token stream
+            async with self._slot(self.llm_scheduler):
+                stream = await self.llm.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=True
+                )
+
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if not token:
+                        continue
+
+                    tokens.append(token)
+                    await self._send_json({"type": "token", "text": token})
+
+                    buffer += token
+                    sentences, buffer = split_sentences(buffer)
+                    for sentence in sentences:
+                        tts_queue.put_nowait(self._synthesize(seq, sentence))
+                        seq += 1
+
+            if buffer.strip():
+                tts_queue.put_nowait(self._synthesize(seq, buffer.strip()))
+
+            tts_queue.put_nowait(None)
+            await sender
+
+            reply = "".join(tokens)
+            await asyncio.to_thread(self.memory.add_turn, self.user_id, text, reply)
+            if self.history:
+                self.history.add_turn(self.user_id, text, reply, source="voice")
+            await self._send_json({"type": "done", "response": reply})
+
+        except asyncio.CancelledError:
+            self._abort_tts(sender, tts_queue)
+            raise
+
+        except Overloaded as e:
+            self._abort_tts(sender, tts_queue)
+            await self._send_json({"type": "error", "error": e.detail,
+                                   "retry_after": float(e.headers["Retry-After"])})
+
+        except Exception as e:
+            self._abort_tts(sender, tts_queue)
+            await self._send_json({"type": "error", "error": str(e)})
+
+    def _abort_tts(self, sender, tts_queue):
+        sender.cancel()
+        while not tts_queue.empty():
+            item = tts_queue.get_nowait()
+            if item is not None:
+                item[2].cancel()
+
+    def _synthesize(self, seq, sentence):
+        # Start synthesis now; the sender awaits tasks in sequence order
+        task = asyncio.create_task(self._speak(sentence))
+        return seq, sentence, task
+
+    async def _speak(self, sentence):
+        async with self._slot(self.voice_scheduler):
+            return await self.voice_service.synthesize(sentence, voice=self.voice)
+
+    def _slot(self, scheduler):
+        return scheduler.slot(self.user_id) if scheduler else nullcontext()
+
+    async def _send_audio_in_order(self, tts_queue):
+        pending = []
+        try:
+            while True:
+                item = await tts_queue.get()
+                if item is None:
+                    break
+                pending.append(item)
+                seq, sentence, task = item
+                audio = await task
+                async with self._send_lock:
+                    await self.websocket.send_text(json.dumps({"type": "audio", "seq": seq, "text": sentence}))
+                    await self.websocket.send_bytes(audio)
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+
+    async def _send_json(self, payload):
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(payload))
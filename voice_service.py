@@ -0,0 +1,97 @@
+import os
+import asyncio
+
+from dotenv import load_dotenv
+from deepgram import DeepgramClient, DeepgramClientOptions
+
+from tts_cache import tts_cache
+
+
+load_dotenv()
+DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# Override the API host, e.g. to point at bench/fake_upstreams.py
+DEEPGRAM_URL = os.getenv("DEEPGRAM_URL")
+WARMUP_PHRASE = "Hi friend! I'm so happy you're here. How are you feeling today?"
+
+
+class VoiceService:
+    def __init__(self, deepgram_key=None):
+        """
+        Request/response voice backend used by the HTTP endpoints:
+        - Prerecorded STT (Nova-2)
+        - TTS through the content-addressed cache in static/audio (Aura)
+        """
+        try:
+            config = DeepgramClientOptions(url=DEEPGRAM_URL) if DEEPGRAM_URL else None
+            self.client = DeepgramClient(api_key=deepgram_key or DEEPGRAM_API_KEY, config=config)
+        except Exception as e:
+            print(f"Deepgram init failed: {e}")
+            self.client = None
+
+    # -----------------------------------------------------------
+    # 🟦 SPEECH-TO-TEXT
+    # -----------------------------------------------------------
+    async def speech_to_text(self, source, mimetype=None):
+        """
+        Transcribes `source`, which may be a path, raw bytes or an open
+        binary file object (e.g. the spooled upload buffer). The async
+        Deepgram client only sends bytes, so paths and file objects are read
+        in a worker thread first.
+        """
+        if not self.client:
+            raise RuntimeError("Deepgram client not initialized.")
+
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                source = await asyncio.to_thread(f.read)
+        elif not isinstance(source, (bytes, bytearray, memoryview)):
+            source.seek(0)
+            source = await asyncio.to_thread(source.read)
+
+        payload = {"buffer": source}
+        if mimetype:
+            payload["mimetype"] = mimetype
+
+        options = {
+            "model": "nova-2-general",
+            "language": "en-IN",
+            "smart_format": True,
+        }
+
+        response = await self.client.listen.asyncprerecorded.v("1").transcribe_file(payload, options)
+        return response.results.channels[0].alternatives[0].transcript
+
+    # -----------------------------------------------------------
+    # 🟩 TEXT-TO-SPEECH
+    # -----------------------------------------------------------
+    async def synthesize(self, text, voice="aura-asteria-en"):
+        """
+        Returns the encoded audio bytes (MP3) for `text`, from the TTS cache
+        when this utterance has been synthesized before.
+        """
+        return await tts_cache.get_bytes(text, voice, self._synthesize_upstream)
+
+    async def text_to_speech(self, text, voice="aura-asteria-en"):
+        """
+        Returns the path of the cached audio file for `text` under static/audio.
+        """
+        return await tts_cache.get_path(text, voice, self._synthesize_upstream)
+
+    async def warmup(self):
+        """
+        Exercises the TTS path once by synthesizing the greeting, so it is
+        cached before the first user asks. Later starts hit the cache.
+        """
+        if not self.client:
+            raise RuntimeError("Deepgram client not initialized.")
+        await self.text_to_speech(WARMUP_PHRASE)
+
+    async def _synthesize_upstream(self, text, voice):
+        if not self.client:
+            raise RuntimeError("Deepgram client not initialized.")
+
+        response = await self.client.speak.asyncrest.v("1").stream({"text": text}, {"model": voice})
+        return response.stream.read()
+
+
+voice_service = VoiceService()
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+
+class BackgroundWorker:
+    def __init__(self, name="magizh-worker"):
+        """
+        Runs coroutines on a private event loop in a daemon thread, so UI
+        handlers never block on network or audio I/O.
+
+        Jobs may be submitted under a `key`; submitting a new job with the
+        same key cancels the previous one (a new message supersedes the
+        reply still streaming for the last one).
+        """
+        self.loop = asyncio.new_event_loop()
+        self._jobs = {}     # key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro, key=None):
+        """Schedules `coro` and returns its concurrent.futures.Future."""
+        future = asyncio.run_coroutine_threadsafe(self._guard(coro), self.loop)
+        if key is None:
+            return future
+
+        with self._lock:
+            previous = self._jobs.get(key)
+            self._jobs[key] = future
+        if previous:
+            previous.cancel()
+
+        def forget(done):
+            with self._lock:
+                if self._jobs.get(key) is done:
+                    del self._jobs[key]
+
+        future.add_done_callback(forget)
+        return future
+
+    def cancel(self, key):
+        """Cancels the running job for `key`. Returns True if there was one."""
+        with self._lock:
+            future = self._jobs.pop(key, None)
+        return bool(future and future.cancel())
+
+    def busy(self, key):
+        with self._lock:
+            return key in self._jobs
+
+    def stop(self):
+        with self._lock:
+            jobs, self._jobs = list(self._jobs.values()), {}
+        for future in jobs:
+            future.cancel()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    @staticmethod
+    async def _guard(coro):
+        # Errors in UI jobs are logged, not left in an unread Future
+        try:
+            return await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Background job error: {e}")